@@ -0,0 +1,161 @@
+# Stand-in for the DomoticzEx module, used to run plugin.py outside Domoticz for benchmarks and replays.
+#
+# Only the parts of the plugin API used by plugin.py are provided: logging, Heartbeat, Devices, Parameters, Unit
+# and Connection (HTTP over TCP/IP). Connection callbacks are not called directly but put on the events queue, the
+# harness calls pump() to deliver them on its own thread, just like Domoticz delivers them on the plugin thread.
+
+import http.client, queue, threading, time
+
+Devices={}
+Parameters={}
+Settings={}
+events=queue.Queue()
+messages=[] # (level, text) of all log calls
+quiet=True # when False log calls are also printed
+heartbeat=[None]
+Debugging=0
+
+def _log(level, text):
+    messages.append((level,str(text)))
+    if not quiet:
+        print(level,text)
+
+def Log(text): _log("Log",text)
+def Status(text): _log("Status",text)
+def Error(text): _log("Error",text)
+def Debug(text): _log("Debug",text)
+
+def Heartbeat(seconds):
+    heartbeat[0]=seconds
+
+def reset(): # clear all devices, parameters and counters between benchmark runs
+    Devices.clear()
+    Parameters.clear()
+    del messages[:]
+    while not events.empty():
+        events.get_nowait()
+    Unit.updateCount=0
+    Unit.nextID=1
+
+class Device:
+    def __init__(self, DeviceID):
+        self.DeviceID=DeviceID
+        self.Units={}
+
+class Unit:
+    updateCount=0 # number of Update() calls on all units
+    nextID=1
+
+    def __init__(self, Name="", Unit=0, Type=0, Subtype=0, Switchtype=0, DeviceID="", Options={}, Used=0, Description="", Image=0, **kwargs):
+        self.Name=Name
+        self.Unit=Unit
+        self.Type=Type
+        self.SubType=Subtype
+        self.SwitchType=Switchtype
+        self.DeviceID=DeviceID
+        self.Options=Options
+        self.Used=Used
+        self.Description=Description
+        self.Image=Image
+        self.nValue=0
+        self.sValue=""
+        self.LastLevel=0
+        self.LastUpdate=""
+        self.ID=0
+
+    def Create(self):
+        self.ID=Unit.nextID
+        Unit.nextID+=1
+        if self.DeviceID not in Devices:
+            Devices[self.DeviceID]=Device(self.DeviceID)
+        Devices[self.DeviceID].Units[self.Unit]=self
+
+    def Update(self, Log=False, TypeName="", UpdateProperties=False, UpdateOptions=False, SuppressTriggers=False):
+        Unit.updateCount+=1
+        self.LastUpdate=time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def Delete(self):
+        del Devices[self.DeviceID].Units[self.Unit]
+        if len(Devices[self.DeviceID].Units)==0:
+            del Devices[self.DeviceID]
+
+class Connection: # HTTP client connection, requests are handled in a thread and answers are queued as events
+    def __init__(self, Name, Transport="TCP/IP", Protocol="HTTP", Address="", Port="80", **kwargs):
+        self.Name=Name
+        self.Transport=Transport
+        self.Protocol=Protocol
+        self.Address=Address
+        self.Port=Port
+        self._http=None
+        self._connecting=False
+
+    def Connected(self):
+        return self._http is not None
+
+    def Connecting(self):
+        return self._connecting
+
+    def Connect(self):
+        self._connecting=True
+        threading.Thread(target=self._connect, daemon=True).start()
+
+    def _connect(self):
+        try:
+            connection=http.client.HTTPConnection(self.Address, int(self.Port), timeout=60)
+            connection.connect()
+            self._http=connection
+            status,description=0,"Connected"
+        except OSError as error:
+            status,description=1,str(error)
+        self._connecting=False
+        events.put(("onConnect",self,status,description))
+
+    def Send(self, Message):
+        threading.Thread(target=self._send, args=(self._http,Message), daemon=True).start()
+
+    def _send(self, connection, Message):
+        try:
+            headers=Message.get("Headers",{})
+            connection.request(Message.get("Verb","GET"), Message["URL"], headers=headers)
+            response=connection.getresponse()
+            body=response.read()
+            message={"Status":str(response.status), "Headers":dict(response.getheaders()), "Data":body}
+            if response.will_close or headers.get("Connection","").lower()=="close": # like Domoticz, onMessage is followed by onDisconnect
+                self._http=None
+                connection.close()
+                events.put([("onMessage",self,message),("onDisconnect",self)])
+            else:
+                events.put(("onMessage",self,message))
+        except (OSError, http.client.HTTPException):
+            self._close()
+
+    def _close(self):
+        if self._http is not None:
+            self._http.close()
+            self._http=None
+            events.put(("onDisconnect",self))
+
+    def Disconnect(self):
+        self._connecting=False
+        if self._http is not None:
+            self._close()
+        else:
+            events.put(("onDisconnect",self))
+
+def deliver(pluginModule, event): # an event is one callback tuple, or a list of callbacks that are always delivered together
+    for callback in (event if isinstance(event,list) else [event]):
+        getattr(pluginModule,callback[0])(*callback[1:])
+
+def pump(pluginModule, seconds, until=None): # deliver queued callbacks for up to seconds, or until until() returns True
+    end=time.perf_counter()+seconds
+    while time.perf_counter()<end:
+        if until is not None and until():
+            break
+        try:
+            event=events.get(timeout=0.005)
+        except queue.Empty:
+            continue
+        deliver(pluginModule,event)
+    while not events.empty(): # callbacks already queued are delivered before the next heartbeat, as in Domoticz
+        deliver(pluginModule,events.get_nowait())
+    return until is not None and until()
@@ -0,0 +1,145 @@
+# Benchmark of plugin.py without Domoticz and without an Xtend.
+#
+# The plugin is loaded with the DomoticzEx stand-in and polls a local FakeXtend. For every polling interval given, a fresh
+# plugin instance is started and run for a number of polls, with a virtual clock so long intervals do not take real time.
+# Reported per interval: onStart time, onStart time of a restart with the devices already created, poll latency (heartbeat until the answer is processed), time spent decoding the
+# answer, Update() calls per poll, and failed polls. The decode time per field is measured separately on one payload.
+# With --endpoints N the plugin polls N fake Xtends at once, the latency is then measured until all have answered.
+#
+# Example:  python3 bench/benchplugin.py --polls 50 --intervals 5,10,30,60,300 --invalid 0.05 --delay 0.05
+
+import argparse, json, os, sys, tempfile, time
+
+sys.path.insert(0,os.path.dirname(os.path.abspath(__file__))) # the DomoticzEx stand-in
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # plugin.py
+import DomoticzEx as Domoticz
+import plugin, xtendcollector
+from fakextend import FakeXtend
+
+class VirtualClock: # replaces the time module inside plugin.py, time() only moves when the benchmark advances it
+    def __init__(self):
+        self.now=time.time()
+    def time(self):
+        return self.now
+    def advance(self, seconds):
+        self.now+=seconds
+    def __getattr__(self, name):
+        return getattr(time,name)
+
+def percentile(values, fraction):
+    if len(values)==0:
+        return 0.0
+    ordered=sorted(values)
+    return ordered[min(len(ordered)-1,int(fraction*len(ordered)))]
+
+def startPlugin(interval, ports, home, sampling="0", diagnostics="0"):
+    Domoticz.reset()
+    Domoticz.Parameters.update({"HardwareID":1, "Mode1":str(interval), "Mode2":"No", "Mode3":"No", "Mode4":sampling, "Mode5":"", "Mode6":diagnostics,
+                                "Address":",".join("127.0.0.1:"+str(port) for port in ports), "Port":"80", "HomeFolder":home+os.sep, "Key":"IntergasXtend", "Name":"Xtend"})
+    plugin.Devices=Domoticz.Devices
+    plugin.Parameters=Domoticz.Parameters
+    plugin._plugin=plugin.XtendPlugin()
+    started=time.perf_counter()
+    plugin.onStart()
+    return time.perf_counter()-started
+
+def runInterval(interval, polls, fakes, pumpTimeout, diagnostics="0"):
+    home=tempfile.mkdtemp(prefix="xtendbench")
+    os.chdir(home) # DASHTICZCONFIG.js is written in the working directory
+    clock=VirtualClock()
+    plugin.time=clock
+    xtendcollector.time=clock # the classes processing the decoded values
+    startupTime=startPlugin(interval, [fake.port for fake in fakes], home, diagnostics=diagnostics)
+    endpoints=plugin._plugin.endpoints
+    processTimes=[]
+    def timed(processXtendData):
+        def timedProcess(Data):
+            started=time.perf_counter()
+            processXtendData(Data)
+            processTimes.append(time.perf_counter()-started)
+        return timedProcess
+    for endpoint in endpoints:
+        endpoint.processXtendData=timed(endpoint.processXtendData)
+    heartbeat=Domoticz.heartbeat[0]
+    while any(endpoint.discovering for endpoint in endpoints): # field discovery at the first start, not measured
+        clock.advance(heartbeat)
+        plugin.onHeartbeat()
+        if not Domoticz.pump(plugin, pumpTimeout, lambda: all(endpoint.pollStarted is None for endpoint in endpoints)):
+            break
+    updatesAtStart=Domoticz.Unit.updateCount
+    errorsAtStart=sum(1 for level,text in Domoticz.messages if level=="Error")
+    latencies=[]
+    pollsDone=0
+    while pollsDone<polls:
+        clock.advance(heartbeat)
+        started=time.perf_counter()
+        plugin.onHeartbeat()
+        if endpoints[0].pollStarted is not None and endpoints[0].pollStarted==clock.now and endpoints[0].pollKind!="keepalive": # a poll was started on this heartbeat
+            pollsDone+=1
+            if Domoticz.pump(plugin, pumpTimeout, lambda: all(endpoint.pollStarted is None for endpoint in endpoints)):
+                latencies.append(time.perf_counter()-started)
+        else:
+            Domoticz.pump(plugin, 0.001)
+    plugin.onStop()
+    plugin._plugin=plugin.XtendPlugin() # restart with the devices, field cache and manifest of the first start
+    started=time.perf_counter()
+    plugin.onStart()
+    restartTime=time.perf_counter()-started
+    plugin.onStop()
+    plugin.time=time
+    xtendcollector.time=time
+    updates=Domoticz.Unit.updateCount-updatesAtStart
+    errors=sum(1 for level,text in Domoticz.messages if level=="Error")-errorsAtStart
+    return {"interval":interval, "polls":polls, "startup_ms":startupTime*1000, "restart_ms":restartTime*1000,
+            "latency_p50_ms":percentile(latencies,0.5)*1000, "latency_p95_ms":percentile(latencies,0.95)*1000,
+            "decode_avg_ms":(sum(processTimes)/len(processTimes)*1000) if processTimes else 0.0, # per endpoint
+            "updates_per_poll":updates/polls, "errors":errors}
+
+def decodeTimes(fake, repeat):
+    # time every decode step of the compiled plan on one payload, in microseconds per field
+    endpoint=plugin._plugin.endpoints[0]
+    steps=[step for tier in endpoint.decodePlan for step in endpoint.decodePlan[tier]]
+    stats,hang,garbage=fake.stats([step[0] for step in steps])
+    results={}
+    for Dev,DeviceID,Unit,unitObj,decoder,arg,deadband in steps:
+        rawValue=stats[Dev]
+        if rawValue==plugin.INVALIDVALUE:
+            continue
+        started=time.perf_counter()
+        for i in range(repeat):
+            decoder(rawValue,arg)
+        results[Dev]=(decoder.__name__,(time.perf_counter()-started)/repeat*1e6)
+    return results
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="Benchmark plugin.py against a local fake Xtend")
+    parser.add_argument("--polls", type=int, default=30)
+    parser.add_argument("--intervals", default="10,30,60,300", help="polling intervals in seconds, comma separated")
+    parser.add_argument("--recorded", help="file with recorded payloads, one JSON object per line")
+    parser.add_argument("--invalid", type=float, default=0.0, help="fraction of values returned as 32767")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every answer of the fake Xtend")
+    parser.add_argument("--hang", type=float, default=0.0, help="fraction of requests that are never answered")
+    parser.add_argument("--garbage", type=float, default=0.0, help="fraction of requests answered with non-JSON data")
+    parser.add_argument("--pump-timeout", type=float, default=2.0, help="real seconds to wait for the answer of one poll")
+    parser.add_argument("--endpoints", type=int, default=1, help="number of fake Xtends polled by the plugin")
+    parser.add_argument("--diagnostics", default="0", help="Mode6 of the plugin: 0 off, 1 devices, 2 devices and metrics file")
+    parser.add_argument("--decode-repeat", type=int, default=2000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args=parser.parse_args()
+
+    fakes=[FakeXtend(0, args.recorded, args.invalid, args.delay, args.hang, args.garbage, seed).start() for seed in range(1,args.endpoints+1)]
+    results=[]
+    print("interval  polls  startup ms  restart ms  latency p50 ms  latency p95 ms  decode ms  updates/poll  errors")
+    for interval in [int(value) for value in args.intervals.split(",")]:
+        result=runInterval(interval, args.polls, fakes, args.pump_timeout, args.diagnostics)
+        results.append(result)
+        print("{interval:8d}  {polls:5d}  {startup_ms:10.1f}  {restart_ms:10.1f}  {latency_p50_ms:14.2f}  {latency_p95_ms:14.2f}  {decode_avg_ms:9.3f}  {updates_per_poll:12.1f}  {errors:6d}".format(**result))
+    perField=decodeTimes(fakes[0], args.decode_repeat)
+    print("\ndecode time per field (us)")
+    for Dev in sorted(perField, key=lambda Dev: -perField[Dev][1]):
+        print("  {}  {:14s}  {:6.2f}".format(Dev,perField[Dev][0],perField[Dev][1]))
+    for fake in fakes:
+        fake.stop()
+    if args.json:
+        with open(args.json,"w") as fileHandle:
+            json.dump({"intervals":results, "decode_us":{Dev:perField[Dev][1] for Dev in perField}}, fileHandle, indent=2)
@@ -0,0 +1,131 @@
+# Local stand-in for the Xtend indoor unit: serves /api/stats/values?fields=... like the Xtend does.
+#
+# Values come from recorded payloads (a file with one {"stats":{...}} JSON object per line, for example collected with
+# curl "http://10.20.30.1/api/stats/values?fields=..." >> recorded.jsonl) which are replayed in a loop, or are generated
+# synthetically for every field in DEVSLIST. Faults can be injected: invalid values (32767), slow answers, requests that
+# are never answered (timeouts) and garbage answers. Fields can be made always invalid or missing from the answers, like
+# on installations without those sensors, to test the field discovery.
+#
+# Standalone use:  python3 bench/fakextend.py --port 8081 --invalid 0.05 --delay 0.2 --hang 0.01
+
+import argparse, http.server, json, os, random, sys, threading, time, urllib.parse
+
+sys.path.insert(0,os.path.dirname(os.path.abspath(__file__))) # the DomoticzEx stand-in
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # plugin.py
+import plugin
+
+class FakeXtend:
+    def __init__(self, port=0, recorded=None, invalid=0.0, delay=0.0, hang=0.0, garbage=0.0, seed=1, invalidFields=(), missingFields=()):
+        self.recorded=[]
+        if recorded:
+            with open(recorded) as fileHandle:
+                for line in fileHandle:
+                    if line.strip():
+                        self.recorded.append(json.loads(line)["stats"])
+        self.invalid=invalid # fraction of values returned as 32767
+        self.delay=delay # seconds added to every answer
+        self.hang=hang # fraction of requests that are never answered
+        self.garbage=garbage # fraction of requests answered with a body that is not JSON
+        self.invalidFields=set(invalidFields) # fields always returned as 32767
+        self.missingFields=set(missingFields) # fields left out of the answers
+        self.random=random.Random(seed)
+        self.requests=0
+        self.counters={} # synthetic counters only increase
+        self.lock=threading.Lock()
+        self.stopEvent=threading.Event()
+        fake=self
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version="HTTP/1.1" # keeps connections open like the Xtend
+            disable_nagle_algorithm=True
+            def do_GET(self):
+                fake.handle(self)
+            def log_message(self, *args):
+                pass
+        self.server=http.server.ThreadingHTTPServer(("127.0.0.1",port),Handler)
+        self.server.daemon_threads=True
+        self.port=self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopEvent.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def synthetic(self, Dev):
+        if Dev=="47e0":
+            return "V0.86"
+        if Dev=="7940":
+            return 255
+        if Dev in plugin.ENUMTEXTS:
+            return self.random.choice(list(plugin.ENUMTEXTS[Dev]))
+        if Dev in plugin.BITFLAGS:
+            return self.random.randint(0,65535)
+        if Dev in plugin.DEVSLIST:
+            Type,Subtype=plugin.DEVSLIST[Dev][1:3]
+            if Type==113: # counters
+                self.counters[Dev]=self.counters.get(Dev,self.random.randint(100,5000))+self.random.randint(0,1)
+                return self.counters[Dev]
+            if Type==243 and Subtype==29: # power in watts
+                return self.random.randint(0,3500)
+            if plugin.DEVSLIST[Dev][5]==1:
+                return self.random.randint(0,1000)
+        return self.random.randint(-500,6000)
+
+    def stats(self, fields):
+        with self.lock:
+            self.requests+=1
+            recorded=self.recorded[(self.requests-1)%len(self.recorded)] if self.recorded else {}
+            stats={}
+            for Dev in fields:
+                if Dev in self.missingFields:
+                    continue
+                if Dev in self.invalidFields or self.invalid>0 and self.random.random()<self.invalid:
+                    stats[Dev]=plugin.INVALIDVALUE
+                elif Dev in recorded:
+                    stats[Dev]=recorded[Dev]
+                else:
+                    stats[Dev]=self.synthetic(Dev)
+            hang=self.hang>0 and self.random.random()<self.hang
+            garbage=self.garbage>0 and self.random.random()<self.garbage
+        return stats,hang,garbage
+
+    def handle(self, request):
+        url=urllib.parse.urlparse(request.path)
+        if url.path!="/api/stats/values":
+            request.send_error(404)
+            return
+        fields=[Dev for Dev in urllib.parse.parse_qs(url.query).get("fields",[""])[0].split(",") if Dev!=""]
+        stats,hang,garbage=self.stats(fields)
+        if hang:
+            self.stopEvent.wait(3600)
+            return
+        if self.delay>0:
+            time.sleep(self.delay)
+        body=b"<html>error</html>" if garbage else json.dumps({"stats":stats}).encode()
+        request.send_response(200)
+        request.send_header("Content-Type","application/json")
+        request.send_header("Content-Length",str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="Local stand-in for the Xtend stats API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--recorded", help="file with recorded payloads, one JSON object per line")
+    parser.add_argument("--invalid", type=float, default=0.0, help="fraction of values returned as 32767")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every answer")
+    parser.add_argument("--hang", type=float, default=0.0, help="fraction of requests that are never answered")
+    parser.add_argument("--garbage", type=float, default=0.0, help="fraction of requests answered with non-JSON data")
+    parser.add_argument("--invalid-fields", default="", help="fields always returned as 32767, comma separated")
+    parser.add_argument("--missing-fields", default="", help="fields left out of the answers, comma separated")
+    args=parser.parse_args()
+    fake=FakeXtend(args.port, args.recorded, args.invalid, args.delay, args.hang, args.garbage, 1,
+                   [Dev for Dev in args.invalid_fields.split(",") if Dev], [Dev for Dev in args.missing_fields.split(",") if Dev])
+    print("Fake Xtend listening on http://127.0.0.1:"+str(fake.port))
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -47,9 +47,51 @@
 #           1) an email will be sent when communication has been restored, if configured
 #           2) notification code has been added as a device
 #           3) a notification will be sent when a notification is raised, if configured
+# version 1.1.0
+#           1) Xtend polling is asynchronous via a Domoticz HTTP connection, the heartbeat no longer waits for the Xtend
+#           2) devices are only updated when their value changed (see DEADBANDS and UpdateMaxAge)
+#           3) decoding is done with a decode plan compiled at startup, text values of codes moved to ENUMTEXTS
+#           4) slowly changing fields (counters, software version) are only requested every 5 minutes, see FIELDTIERS
+#              5 second polling interval added
+#           5) optional high resolution sampling of selected fields in a background thread, mean/min/max published per poll
+#           6) all polled values are stored in a local SQLite database (xtend_samples.db), see queryXtendStore in xtendcollector.py
+#           7) the connection to the Xtend is kept open between polls, separate connect and read timeouts,
+#              emails are sent through a persistent session
+#           8) circuit breaker: after repeated failures polling stops and only a small probe request is sent with increasing
+#              intervals until the Xtend answers again, state shown on the new device "Link state"
+#           9) email alerts are sent by a background thread, each kind of alert separately with its own "solved" email
+#          10) optional diagnostics: poll timings, device update counts, invalid values and error rate on devices and in a
+#              Prometheus text file (xtend.prom) for the node_exporter textfile collector
+#          11) several Xtend units can be polled by one plugin instance, addresses set in the hardware settings
+#          12) field discovery: fields that always return an invalid value or are not known by the Xtend are no longer polled,
+#              result cached per firmware version in xtend_fields.json
+#          13) faster startup: devices and the Dashticz config are only checked and written when the device definitions or the
+#              devices in Domoticz changed (xtend_manifest.json), Dashticz columns defined in DASHTICZCOLUMNS
+#          14) derived metrics on new devices: delta T, thermal power and live COP of the heatpump, COP over 15 minutes and
+#              today, heatpump share of the heat generated today, see DERIVEDMETRICS
+#          15) gas classification: the increase of the P1 gas meter is split over heating, hot water and cooking counters,
+#              using the boiler status periods, replaces the two dzVents scripts in "additional scripts"
+#          16) state accounting: time in state and transitions of the status fields and the defrost cycles, per day and in
+#              total, on counter devices and in xtend_states.json, see STATEFIELDS
+#          17) optional energy integration by the plugin at poll or sample resolution, with the energy counters kept in
+#              xtend_energy.json, see ENERGYINTEGRATION. Energy generated of heatpump and boiler added to SAMPLERFIELDS
+#          18) optional export of every poll to an MQTT broker and/or InfluxDB line protocol files, written by a background
+#              thread, see MQTTBROKER and INFLUXFOLDER
+#          19) the last answers of the Xtend are kept in memory and written to xtend_raw.jsonl on a decode error, a burst of
+#              invalid values, a new notification code or with the new "Dump raw answers" button, see RAWBUFFERSIZE.
+#              Poll timings and device update counts are no longer written to the log on every poll
+#          20) field definitions, decoders, fetcher, processing of the decoded values and export sinks moved to
+#              xtendcollector.py, which can also poll the Xtend on its own without Domoticz and write to stdout, files,
+#              InfluxDB, MQTT or the Domoticz JSON API
+#          21) keep-alive: a small request is sent when the Xtend was not polled for 2 minutes, the cron job in the README is
+#              no longer needed while Domoticz runs. Round trip, jitter and loss on the new "Link" devices, with an alert
+#              when the connection degrades, see KeepAliveInterval
+#          22) anomaly detection: running mean, variance and rate of change of pressures, overheat temperatures and compressor
+#              frequency, an alert when a value leaves its normal range before the Xtend gives a notification code.
+#              Baselines kept in xtend_anomaly.json, see ANOMALYFIELDS
 
 """
-<plugin key="IntergasXtend" name="Intergas Xtend heatpump" author="WillemD61" version="1.0.7" >
+<plugin key="IntergasXtend" name="Intergas Xtend heatpump" author="WillemD61" version="1.1.0" >
     <description>
         <h2>Intergas Xtend heatpump</h2><br/>
         This plugin uses the API on the Intergas Xtend WIFI connection to get the values of a large numbers of parameters<br/>
@@ -59,11 +101,15 @@
         Also the Domoticz server needs to be connected already to the active Xtend WIFI connection.<br/><br/>
         A large number of devices is created, similar to the parameters shown in the Intergas web interface.<br/>
         Also the Home Assistant integrations by DSchoutsen and thomasvt1 published on Github were used as input.<br/><br/>
+        Several Xtend units can be polled by entering their addresses separated by commas, for example 10.20.30.1,192.168.1.60:8080<br/>
         Configuration options...
     </description>
     <params>
+        <param field="Address" label="Xtend address(es)" width="300px" required="true" default="10.20.30.1"/>
+        <param field="Port" label="Port" width="60px" required="true" default="80"/>
         <param field="Mode1" label="Polling Interval" width="150px">
             <options>
+                <option label="5 seconds" value="5" />
                 <option label="10 seconds" value="10" />
                 <option label="20 seconds" value="20" />
                 <option label="30 seconds" value="30" default="true" /> # maximum domoticz heartbeat time is 30 seconds
@@ -86,98 +132,1225 @@
                 <option label="No" value="No" default="true" />
             </options>
         </param>
+        <param field="Mode4" label="High resolution sampling" width="150px">
+            <options>
+                <option label="Off" value="0" default="true" />
+                <option label="1 second" value="1" />
+                <option label="2 seconds" value="2" />
+                <option label="5 seconds" value="5" />
+            </options>
+        </param>
+        <param field="Mode5" label="P1 gas meter idx (empty: no gas classification)" width="75px" />
+        <param field="Mode6" label="Diagnostics" width="150px">
+            <options>
+                <option label="Off" value="0" default="true" />
+                <option label="Devices" value="1" />
+                <option label="Devices and metrics file" value="2" />
+            </options>
+        </param>
     </params>
 </plugin>
 """
 import DomoticzEx as Domoticz
 import json,requests   # make sure these are available in your system environment
-from requests.exceptions import Timeout
-
-# A dictionary to list all parameters to be retrieved from Xtend and to define the Domoticz devices to hold them.
-# Temperature sensor are listed first but order of sensors is not important for the functioning of the program
-# Make sure Unit numbers are incremental and make sure fieldcodes are correct!!!!
-# currently only english name is provided, can be extended with other languages
-# availability of some sensors values will depend on your boiler type and year
-
-# Dictionary structure is as follows: fieldcode : [ Unit, Type, Subtype, Switchtype, OptionsList{}, Multiplier, Name ],
-
-DEVSLIST={
-# 80,5,0 : temperature devices
-    "79b3":  [ 1, 80, 5, 0, {}, 0.01, "Room temp"],
-    "7921":  [ 2, 80, 5, 0, {}, 0.01, "Target room temp"],
-    "62d1":  [ 3, 80, 5, 0, {}, 0.01, "Outside temp"],
-    "6280":  [ 4, 80, 5, 0, {}, 0.01, "HP return temp"],
-    "62e7":  [ 5, 80, 5, 0, {}, 0.01, "HP supply temp "],
-    "62ed":  [ 6, 80, 5, 0, {}, 0.01, "HP setpoint temp"],
-    "65d9":  [ 7, 80, 5, 0, {}, 0.01, "Exhaust gas temp"],
-    "6505":  [ 8, 80, 5, 0, {}, 0.01, "Suction line gas temp"],
-    "47e0":  [ 9, 243,19, 0, {}, 1, "Software version"], # added to replace unused device in version 1.0.0.
-    "6c26":  [ 10, 80, 5, 0, {}, 0.01, "Condensor gas temp"],
-    "6ceb":  [ 11, 80, 5, 0, {}, 0.01, "Condensor liquid temp"],
-    "6cfb":  [ 12, 80, 5, 0, {}, 0.01, "Suction line overheat temp"],
-    "6c33":  [ 13, 80, 5, 0, {}, 0.01, "Discharge overheat temp"],
-    "6c53":  [ 14, 80, 5, 0, {}, 0.01, "Subcooling temp"],
-    "65c1":  [ 15, 80, 5, 0, {}, 0.01, "Coil temp"],
-    "7ee6":  [ 16, 80, 5, 0, {}, 0.01, "Boiler temp"], # replacing 8e38 because no longer available in firmware 0.86
-    "7e31":  [ 17, 80, 5, 0, {}, 0.01, "Boiler CH setpoint temp"],
-    "625b":  [ 18, 80, 5, 0, {}, 0.01, "Boiler CH supply temp"],
-    "7e81":  [ 19, 80, 5, 0, {}, 0.01, "Boiler CH return temp"],
-    "8ecb":  [ 20, 80, 5, 0, {}, 0.01, "Boiler DHW max temp"],
-    "8edb":  [ 21, 80, 5, 0, {}, 0.01, "Boiler DHW actual temp"],
-# 243,9,0 : pressure devices
-    "7ed3":  [ 22, 243, 9, 0, {}, 0.01, "CH water pressure"],
-    "6579":  [ 23, 243, 9, 0, {}, 0.01, "HP suction pressure"],
-    "65b0":  [ 24, 243, 9, 0, {}, 0.01, "HP discharge gas pressure"],
-# 243,30,0 : flow devices
-    "8e7f":  [ 25, 243, 30, 0, {}, 0.01, "Boiler DHW flow"],
-    "629c":  [ 26, 243, 30, 0, {}, 0.01, "HP CH flow"],
-# 243,7,0 : fan device
-    "6c8a":  [ 27, 243, 7, 0, {}, 1, "Fan speed"], # note multiplier 1
-# 243,6,0 : percentage device
-    "848e":  [ 28, 243, 6, 0, {}, 0.01, "Boiler modulation target"],
-    "84d1":  [ 29, 243, 6, 0, {}, 0.01, "Boiler modulation level"],
-    "62cb":  [ 30, 243, 6, 0, {}, 0.01, "Pump level"],
-# 243,31,0 : custom device
-    "65a7":  [ 31, 243, 31, 0, {'Custom':'1;Hz'}, 0.01, "Compressor frequency"], # note options field sets the label for custom device
-    "71a7":  [ 32, 243, 31, 0, {'Custom':'1;HR'}, 1, "HP poweron"],
-# 113,0,3 : counter device
-    "6ac5":  [ 33, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'HR'}, 1, "HP runtime"],
-    "8ef9":  [ 34, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'HR'}, 1, "Boiler CH runtime"],
-    "8e37":  [ 35, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'HR'}, 1, "Boiler DHW runtime"],
-    "6a8e":  [ 36, 113, 0, 3, {}, 1, "HP Compressor starts"],
-    "7160":  [ 37, 113, 0, 3, {}, 1, "HP power cycles"],
-    "6a53":  [ 38, 113, 0, 3, {}, 1, "HP defrost cycles"],
-    "8e00":  [ 39, 113, 0, 3, {}, 1, "Boiler starts"],
-    "6a8d":  [ 40, 113, 0, 3, {}, 1, "Boiler DHW starts"],
-    "8e18":  [ 41, 113, 0, 3, {}, 1, "Boiler flame loss count"],
-    "712c":  [ 42, 113, 0, 3, {}, 1, "Boiler ignition fail count"],
-# 243,29,0 or 4: kwh device
-    "50f2":  [ 43, 243, 29, 0, {'EnergyMeterMode': '1'}, 1, "HP energy usage"],
-    "503e":  [ 44, 243, 29, 4, {'EnergyMeterMode': '1'}, 1, "HP energy generated"],
-# 243,31,0 : custom device
-    "5041":  [ 45, 243, 31, 0, {}, 0.1, "COP"],
-# 243,19,0 : text device
-    "f9f2":  [ 46, 243, 19, 0, {}, 1, "Heat demand Boiler"],
-    "7e51":  [ 47, 243, 19, 0, {}, 1, "Device status"],
-    "7940":  [ 48, 243, 19, 0, {}, 1, "Notification"],
-    "6578":  [ 49, 243, 19, 0, {}, 1, "Operating mode"],
-    "777d":  [ 50, 243, 19, 0, {}, 1, "Heat demand HP"],
-    "77dd":  [ 51, 243, 19, 0, {}, 1, "System status"],
-    "843a":  [ 52, 243, 19, 0, {}, 1, "Boiler status"],
-# devices added in later versions
-    "5088":  [ 53, 243, 29, 4, {'EnergyMeterMode': '1'}, 1, "Boiler energy generated"],
-#    "b2bc":  [ 54, 243, 19, 0, {}, 1, "Boiler flame"],
-#    "f9f2":  [ 55, 243, 19, 0, {}, 1, "Status flags"],
+import time,threading,queue,os,hashlib
+from collections import deque
+# The fields retrieved from the Xtend and their devices (DEVSLIST), the decoders, the fetcher, the processing of the
+# decoded values and the export sinks are in xtendcollector.py, shared with the standalone collector
+# (python3 xtendcollector.py --help)
+from xtendcollector import (DEVSLIST, POLLTIERS, FIELDTIERS, INVALIDVALUE, ENUMTEXTS, BITFLAGS, STRINGFIELDS,
+                            XtendIP, XtendPort, XtendAPI, XtendConnectTimeout, XtendReadTimeout, DomoticzTimeouts,
+                            decodeNumeric, decodeKwh, fieldDecoder, writeAtomic, rotateFile, parseEndpoints, endpointFile,
+                            DERIVEDMETRICS, ENERGYFIELDS, ANOMALYFIELDS, EnergySaveInterval, AnomalySaveInterval,
+                            XtendDerived, XtendStates, XtendEnergy, XtendAnomaly, XtendStore,
+                            XtendFetcher, XtendMqttSink, XtendInfluxSink, XtendExporter, mqtt)
+
+# A dictionary of the devices of the plugin itself, holding information that is not an Xtend field value.
+# Devices of a group other than "" are only created when that group is switched on in the hardware settings.
+# Dictionary structure is as follows: key : [ Unit, Type, Subtype, Switchtype, OptionsList{}, Name, Group ],
+PLUGINDEVS={
+    "linkstate":  [ 100, 243, 19, 0, {}, "Link state", ""],
+    "rtt":        [ 101, 243, 31, 0, {'Custom':'1;ms'}, "Poll round trip", "diagnostics"],
+    "parsetime":  [ 102, 243, 31, 0, {'Custom':'1;ms'}, "JSON parse time", "diagnostics"],
+    "decodetime": [ 103, 243, 31, 0, {'Custom':'1;ms'}, "Decode time", "diagnostics"],
+    "updates":    [ 104, 243, 31, 0, {'Custom':'1;updates'}, "Device updates per poll", "diagnostics"],
+    "updatetime": [ 105, 243, 31, 0, {'Custom':'1;ms'}, "Device update time", "diagnostics"],
+    "invalid":    [ 106, 243, 31, 0, {'Custom':'1;values'}, "Invalid values per poll", "diagnostics"],
+    "errorrate":  [ 107, 243, 31, 0, {'Custom':'1;%'}, "Poll error rate", "diagnostics"],
+    "rawdump":    [ 108, 244, 73, 9, {}, "Dump raw answers", ""],
+    "linkrtt":    [ 140, 243, 31, 0, {'Custom':'1;ms'}, "Link round trip", ""],
+    "linkjitter": [ 141, 243, 31, 0, {'Custom':'1;ms'}, "Link jitter", ""],
+    "linkloss":   [ 142, 243, 31, 0, {'Custom':'1;%'}, "Link loss", ""],
+    "gasheating": [ 120, 113, 0, 1, {}, "Gas heating", "gas"],
+    "gashotwater":[ 121, 113, 0, 1, {}, "Gas hot water", "gas"],
+    "gascooking": [ 122, 113, 0, 1, {}, "Gas cooking", "gas"],
+}
+
+# Default Dashticz dashboard written to DASHTICZFILE in the Domoticz folder: one screen (number DashticzScreen, change it if
+# you already have Dashticz screens) with the columns below, column name : Units of the devices of the first Xtend.
+DASHTICZFILE="DASHTICZCONFIG.js"
+DashticzScreen=1
+DASHTICZCOLUMNS={
+    "xtendsummary":  [1,2,3,47,49,51,50,9],
+    "xtendtoday":    [22,32,33,36,37,38,43,44,45],
+    "xtendactual1":  [6,5,4,7,8,10,11,12,13],
+    "xtendactual2":  [14,15,23,24,27,30,26,31],
+    "boileractual1": [34,35,39,40,52,46,41,42,53],
+    "boileractual2": [16,17,18,19,28,29,20,21,25],
+}
+# Startup: a hash of the device definitions and the devices of this hardware in Domoticz is kept in MANIFESTFILE in the
+# plugin folder. When it is unchanged at the next start, the devices exist already and DASHTICZFILE is up to date, so
+# creating devices and writing the Dashticz config are skipped.
+MANIFESTFILE="xtend_manifest.json"
+
+# The addresses of the Xtend indoor units are set in the hardware settings (Address and Port). Several units can be polled
+# by one plugin instance, enter their addresses separated by commas, each optionally with its own port (address:port).
+# The devices of the first unit keep their DeviceIDs, the next units get their own DeviceIDs and names "XTEND 2: ..." etc.
+MaxEndpoints=8
+
+# Circuit breaker: after BreakerThreshold failed polls in a row polling is suspended ("open") and only a probe for the
+# BreakerProbeFields is sent, first after BreakerBackoffMin seconds, then each time twice as long up to BreakerBackoffMax.
+# When a probe is answered ("half-open" while waiting) normal polling is resumed ("closed").
+BreakerThreshold=3
+BreakerBackoffMin=30
+BreakerBackoffMax=600
+BreakerProbeFields="47e0" # the software version, always polled, any answer with stats closes the breaker
+
+# Keep-alive and link health: when no request was sent to the Xtend for KeepAliveInterval seconds, for example with a long
+# polling interval, the probe request is sent to keep the Xtend WIFI connection open. The round trip of every request and
+# the requests without an answer are kept for the last LinkWindow requests. The average round trip, the jitter (average
+# difference between consecutive round trips) and the loss are shown on the "Link" devices. A "linkquality" alert is
+# raised when the loss reaches LinkLossWarning percent or the average round trip LinkRttWarning ms, before polls time out.
+KeepAliveInterval=120
+LinkWindow=30
+LinkLossWarning=10
+LinkRttWarning=1000
+DomoticzURL="http://127.0.0.1:8080/json.htm" # the Domoticz JSON API, used for sending email notifications
+
+# Email alerts, kind : [ subject and body of the alert, subject and body of the email when the problem is solved ]
+# An alert is sent once and then not again until it is solved. The same alert is not sent again within AlertMinInterval
+# seconds after it was solved, so a flapping connection does not flood the mailbox. An outage that opens the circuit
+# breaker is always alerted, also within AlertMinInterval.
+ALERTTEXTS={
+    "timeout":      ["ATTENTION: XTEND communication timeout", "Please check and restore the connection by pushing the button on the Xtend",
+                     "XTEND comms working again", "Problem solved: communication timeout"],
+    "dataerror":    ["ATTENTION: XTEND communication data error", "Please check the log and solve the error.",
+                     "XTEND comms working again", "Problem solved: communication data error"],
+    "notification": ["ATTENTION: XTEND notification", "Please check code {code}",
+                     "XTEND notification solved", "Notification code {code} is no longer active"],
+    "anomaly":      ["WARNING: XTEND value out of its normal range", "Please check {code}, this may precede a notification code of the Xtend.",
+                     "XTEND value back in its normal range", "Problem solved: {code}"],
+    "linkquality":  ["WARNING: XTEND connection degraded", "The round trip or loss of the requests to the Xtend is above the warning level, please check the WIFI connection.",
+                     "XTEND connection quality restored", "Problem solved: connection degraded"],
+}
+AlertMinInterval=3600
+AlertQueueSize=20
+
+# Gas classification: if the idx of the P1 gas meter is set in the hardware settings, the meter is read through the Domoticz
+# JSON API every GasReadInterval seconds. Each increase is split over the "gas" devices according to the time the boiler
+# (field 843a of the first Xtend) was heating or making hot water during the period of the increase. An increase without
+# any boiler activity is cooking. The counters are in liters, set the meter divider of these devices to 1000 to see m3.
+GASSTATES={10:"gasheating", 4:"gashotwater", 8:"gashotwater", 12:"gashotwater"} # value of 843a : device the gas is counted on
+GasReadInterval=30
+GasIntervalKeep=7200 # seconds the boiler periods are kept, must be longer than the update interval of the gas meter
+
+# Write cache: a device is only updated when its value differs more than the deadband for its device type from the value
+# last written, or when it has not been updated for UpdateMaxAge seconds (this keeps "last seen" in Domoticz up to date).
+# Text devices, and kwh devices with the energy integrated by the plugin (see ENERGYINTEGRATION), are only compared on their text.
+UpdateMaxAge=300
+DEADBANDS={ # (Type,Subtype) : change of the value that is still considered unchanged
+    (80,5): 0.15,  # temperature, ignores 0.1 degree flicker
+    (243,9): 0,    # pressure
+    (243,30): 0,   # waterflow
+    (243,7): 0,    # fan
+    (243,6): 0,    # percentage
+    (243,31): 0,   # custom
+    (113,0): 0,    # counter
+    (243,29): 0,   # kwh, value in watts
+}
+
+# High resolution sampling: if switched on in the hardware settings, a background thread requests the fields below at the
+# chosen sampling interval. On every poll the mean of the samples is loaded onto the device of the field and, if SAMPLERMINMAX
+# is True, the minimum and maximum are loaded onto two additional devices. Only numeric fields can be sampled.
+SAMPLERFIELDS={ # fieldcode : [ Unit of minimum device, Unit of maximum device ]
+    "62e7": [200, 201], # HP supply temp
+    "6280": [202, 203], # HP return temp
+    "629c": [204, 205], # HP CH flow
+    "8e7f": [206, 207], # Boiler DHW flow
+    "65a7": [208, 209], # Compressor frequency
+    "50f2": [210, 211], # HP energy usage, minimum and maximum shown as power in watts
+    "503e": [212, 213], # HP energy generated, same
+    "5088": [214, 215], # Boiler energy generated, same
+}
+SAMPLERMINMAX=False
+SAMPLERBUFFER=600 # maximum number of samples kept between two polls, older samples are dropped
+
+# Derived metrics (DERIVEDMETRICS), state accounting (STATEFIELDS), the energy integration limits (ENERGYFIELDS), anomaly
+# detection (ANOMALYFIELDS) and the sample store are in xtendcollector.py, shared with the standalone collector. Below
+# only the files in the plugin folder and the devices.
+
+# State accounting: the time in state and transitions of the STATEFIELDS and the defrost cycles are kept in STATEFILE in
+# the plugin folder, written every StateSaveInterval seconds, at midnight and at stop. Set STATEFILE to "" to switch off.
+STATEFILE="xtend_states.json"
+# Devices showing the state accounting. The counters hold the totals, so Domoticz shows the minutes or transitions per day.
+# Measure "minutes": time in the states listed, "transitions": number of times these states were entered, "lastcycle":
+# duration in seconds of the last completed period in the first state listed.
+# Dictionary structure is as follows: key : [ Unit, Type, Subtype, Switchtype, OptionsList{}, Name, fieldcode, states, measure ],
+STATEDEVICES={
+    "defrosttime":   [ 130, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'min'}, "HP defrost time", "77dd", [3], "minutes"],
+    "defrosts":      [ 131, 113, 0, 3, {}, "HP defrosts", "77dd", [3], "transitions"],
+    "lastdefrost":   [ 132, 243, 31, 0, {'Custom':'1;s'}, "HP last defrost duration", "77dd", [3], "lastcycle"],
+    "hpdhwtime":     [ 133, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'min'}, "HP hot water time", "77dd", [4], "minutes"],
+    "hpheatingtime": [ 134, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'min'}, "HP room heating time", "77dd", [5,6], "minutes"],
+    "hpcoolingtime": [ 135, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'min'}, "HP room cooling time", "77dd", [7], "minutes"],
+    "boilergastime": [ 136, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'min'}, "Boiler gas heating time", "843a", [10], "minutes"],
+    "boilerdhwtime": [ 137, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'min'}, "Boiler hot water time", "843a", [4,8,12], "minutes"],
+}
+
+# Energy integration: normally the kwh devices get the power in watts and Domoticz calculates the energy from the time
+# between two updates. If ENERGYINTEGRATION is True the plugin integrates the power itself over the time of every poll,
+# or of every sample when the field is sampled (see SAMPLERFIELDS), with the trapezium rule, and loads the energy in Wh
+# onto the devices of the ENERGYFIELDS (EnergyMeterMode 0, "from device"). The energy counters are kept in ENERGYFILE in
+# the plugin folder, written every EnergySaveInterval seconds and at stop. At the first start they continue from the
+# energy Domoticz calculated so far.
+ENERGYINTEGRATION=False
+ENERGYFILE="xtend_energy.json"
+
+# Anomaly detection: an "anomaly" alert is raised and solved for the ANOMALYFIELDS, the baselines are kept in ANOMALYFILE
+# in the plugin folder, written every AnomalySaveInterval seconds and at stop, so a restart does not start learning again.
+# Set ANOMALYFILE to "" to switch off.
+ANOMALYFILE="xtend_anomaly.json"
+
+# Local sample store: the decoded values of every poll are written to STOREFILE in the plugin folder, see STOREBATCH.
+# queryXtendStore in xtendcollector.py reads them back. Set STOREFILE to "" to switch off.
+STOREFILE="xtend_samples.db"
+
+# Diagnostics: the poll loop is always measured, if switched on in the hardware settings the measurements are loaded
+# onto the "diagnostics" devices every MetricsInterval seconds and optionally written to METRICSFILE in the Prometheus
+# text format. METRICSFILE is relative to the plugin folder, or an absolute path such as the textfile collector directory
+# of node_exporter. The error rate is taken over the last MetricsWindow polls.
+METRICSFILE="xtend.prom"
+MetricsInterval=60
+MetricsWindow=100
+
+# Export: the decoded values of every poll can be handed to other tools without going through Domoticz. A background thread
+# writes them in batches, when a sink is slow or not reachable the oldest are dropped, the polling never waits (see the
+# export sinks in xtendcollector.py for the batch and queue sizes).
+# MQTTBROKER: "host" or "host:port" of an MQTT broker, each poll is published as one JSON message {"time":..., fieldcode:
+# value, ...} on MQTTTOPIC/<endpoint>, for example xtend/Xtend. Needs the paho-mqtt package (pip3 install paho-mqtt).
+# INFLUXFOLDER: folder (relative to the plugin folder, or absolute) for files in the InfluxDB line protocol, measurement
+# "xtend" with tag endpoint and one field per fieldcode, time in milliseconds (import with precision ms). The file is
+# rotated when it grows beyond ExportMaxBytes. Leave "" to switch a sink off.
+MQTTBROKER=""
+MQTTTOPIC="xtend"
+INFLUXFOLDER=""
+
+# Raw answers: the last RAWBUFFERSIZE answers of the Xtend are kept in memory as received, with their time and transfer
+# time. They are appended to RAWDUMPFILE in the plugin folder when an answer can not be decoded, when a poll has at least
+# RawInvalidBurst invalid values (32767), when a new notification code is received, and on demand with the "Dump raw
+# answers" button. The same automatic reason is dumped at most once every RawDumpMinInterval seconds. The file is rotated
+# when it grows beyond RawDumpMaxBytes, RawDumpKeep older files are kept.
+RAWBUFFERSIZE=30
+RAWDUMPFILE="xtend_raw.jsonl"
+RawInvalidBurst=10
+RawDumpMinInterval=900
+RawDumpMaxBytes=2000000
+RawDumpKeep=3
+
+# Field discovery: at the first start, and again when the firmware version (47e0) changes, the fields in DEVSLIST and
+# CANDIDATEFIELDS are requested in chunks of DiscoveryChunk fields, in DiscoveryRounds rounds of one heartbeat each.
+# Every field is classified as "supported", "invalid" (only 32767 received) or "missing" (not in the answers). Only the
+# supported fields are polled afterwards. The invalid fields of DEVSLIST are still requested with the DiscoveryRecheckTier
+# fields and become supported again on their first valid value, as some are only invalid while for example the boiler is
+# idle. The result is cached in FIELDCACHE in the plugin folder and renewed after DiscoveryMaxAge days. Delete this file to force a new discovery, set FIELDCACHE to "" to always poll all fields.
+FIELDCACHE="xtend_fields.json"
+DiscoveryChunk=16
+DiscoveryRounds=3
+DiscoveryMaxAge=30
+DiscoveryRecheckTier="slow"
+CANDIDATEFIELDS={ # fieldcode : name, codes from the spreadsheet in the documentation folder that are not (yet) in DEVSLIST
+    "6573": "Ambient temp", "623c": "Boiler return temp", "6256": "DHW cold temp", "6269": "DHW hot temp",
+    "628d": "DHW preheat temp", "6290": "DHW flow", "657a": "Phase current", "657e": "Operation mode",
+    "658a": "Compressor frequency setpoint", "5077": "Thermal power", "7e7a": "Burner status", "7e82": "Flame current",
+    "844c": "Boiler CH pressure", "8e38": "Boiler temp", "8e8f": "Boiler CH water setpoint", "b2bc": "Boiler flame",
 }
 
-# define the url to get the Xtend field values
-XtendIP="http://10.20.30.1"  # the IP address of the Xtend indoor unit after activation by pressing the button
-XtendAPI="/api/stats/values?fields=" # the API line to request field values
-APIFieldsString=""  # the list of field values to be requested in the url, based on the dictionary above
-for Dev in DEVSLIST:
-    APIFieldsString+=Dev
-    APIFieldsString+=","
-APIurl=XtendIP+XtendAPI+APIFieldsString
+def decodeEnergy(rawValue, arg): # arg is (XtendEnergy, fieldcode, True to integrate this value), the power in watts and the energy in Wh
+    energy,Dev,integrate=arg
+    if integrate:
+        energy.add(Dev,time.time(),rawValue)
+    if energy.rejected(Dev,rawValue):
+        return None
+    return 0, str(rawValue)+";"+str(int(energy.wh(Dev))), rawValue
+
+class XtendAlerter: # background thread sending the email alerts through the Domoticz JSON API, so a poll never waits for it
+    def __init__(self):
+        self.queue=queue.Queue(maxsize=AlertQueueSize)
+        self.failed=0 # alerts that could not be delivered to Domoticz
+        self.dropped=0 # alerts not queued because the queue was full
+        self.thread=threading.Thread(name="XtendAlerter", target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        try:
+            self.queue.put(None,timeout=1)
+        except queue.Full:
+            pass
+        self.thread.join(sum(DomoticzTimeouts)+1)
+
+    def send(self, subject, body):
+        try:
+            self.queue.put_nowait((subject,body))
+        except queue.Full:
+            self.dropped+=1
+
+    def run(self): # no Domoticz calls are allowed in this thread
+        session=requests.Session()
+        while True:
+            alert=self.queue.get()
+            if alert is None:
+                break
+            try:
+                session.get(DomoticzURL, params={"type":"command", "param":"sendnotification", "subject":alert[0], "body":alert[1]}, timeout=DomoticzTimeouts).raise_for_status()
+            except Exception:
+                self.failed+=1
+        session.close()
+
+class XtendGasReader: # background thread reading the P1 gas meter through the Domoticz JSON API
+    def __init__(self, idx):
+        self.idx=idx
+        self.readings=deque(maxlen=100) # (time of the meter update, counter in m3), appended when the counter changed
+        self.errors=0
+        self.stopEvent=threading.Event()
+        self.thread=threading.Thread(name="XtendGasReader", target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopEvent.set()
+        self.thread.join(sum(DomoticzTimeouts)+1)
+
+    def run(self): # no Domoticz calls are allowed in this thread
+        session=requests.Session()
+        lastCounter=None
+        while not self.stopEvent.is_set():
+            try:
+                response=session.get(DomoticzURL, params={"type":"command", "param":"getdevices", "rid":self.idx}, timeout=DomoticzTimeouts)
+                device=response.json()["result"][0]
+                counter=float(str(device["Counter"]).split()[0])
+                if counter!=lastCounter:
+                    self.readings.append((time.mktime(time.strptime(device["LastUpdate"],"%Y-%m-%d %H:%M:%S")),counter))
+                    lastCounter=counter
+            except Exception:
+                self.errors+=1
+            self.stopEvent.wait(GasReadInterval)
+        session.close()
+
+class XtendSampler: # background thread requesting a small set of fields at a short interval
+    def __init__(self, fetcher, fields, interval):
+        self.fetcher=fetcher
+        self.fields=fields
+        self.interval=interval
+        self.samples=deque(maxlen=SAMPLERBUFFER) # (time, stats) tuples, appended by the thread and taken out by the plugin
+        self.errors=0
+        self.paused=False
+        self.stopEvent=threading.Event()
+        self.thread=threading.Thread(name="XtendSampler", target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopEvent.set()
+        self.thread.join(XtendConnectTimeout+XtendReadTimeout+1)
+
+    def run(self): # no Domoticz calls are allowed in this thread
+        while not self.stopEvent.is_set():
+            started=time.time()
+            try:
+                self.samples.append((started,self.fetcher.fetch(self.fields)))
+            except Exception:
+                self.errors+=1
+            self.stopEvent.wait(max(0,self.interval-(time.time()-started)))
+            while self.paused and not self.stopEvent.is_set(): # no sampling while the circuit breaker is open
+                self.stopEvent.wait(1)
+        self.fetcher.close()
+
+class XtendMetrics: # counters and timings of the poll loop, for the diagnostic devices and the metrics file
+    def __init__(self):
+        self.polls={"ok":0, "timeout":0, "dataerror":0} # result : number of polls
+        self.recentPolls=deque(maxlen=MetricsWindow) # True for a successful poll, False for a failed one
+        self.connectTime=0.0 # seconds needed for the last new connection
+        self.transferTime=0.0 # seconds from sending the last request until the answer was received
+        self.connectionReused=False # the last poll was sent on a connection kept open
+        self.parseTime=0.0 # seconds for the JSON parsing of the last answer
+        self.decodeTimes={} # device type "Type_Subtype" : seconds spent decoding the fields of that type during the last poll
+        self.decodeTotals={} # device type : seconds spent decoding since the start
+        self.updatesDone=0
+        self.updatesSkipped=0
+        self.updateTime=0.0 # seconds spent in Update() since the start
+        self.pollUpdates=0 # Update() calls during the last poll
+        self.pollUpdateTime=0.0 # seconds spent in Update() during the last poll
+        self.invalidValues={} # fieldcode : number of invalid values received since the start
+        self.pollInvalid=0 # invalid values in the last poll
+
+    def pollDone(self, result): # result is "ok", "timeout" or "dataerror"
+        self.polls[result]+=1
+        self.recentPolls.append(result=="ok")
+
+    def roundTrip(self): # seconds from the start of the last poll until the answer
+        return self.transferTime if self.connectionReused else self.connectTime+self.transferTime
+
+    def errorRate(self): # percentage of failed polls in the last MetricsWindow polls
+        if len(self.recentPolls)==0:
+            return 0.0
+        return 100.0*self.recentPolls.count(False)/len(self.recentPolls)
+
+    def samples(self, breakerState): # the metrics as a list of (name, type, help text, labels, value)
+        samples=[]
+        for result in self.polls:
+            samples.append(("xtend_polls_total","counter","Polls of the Xtend by result.",'result="'+result+'"',self.polls[result]))
+        samples+=[("xtend_poll_error_ratio","gauge","Failed polls in the last "+str(MetricsWindow)+" polls.","",self.errorRate()/100),
+                  ("xtend_breaker_open","gauge","Polling suspended by the circuit breaker.","",0 if breakerState=="closed" else 1),
+                  ("xtend_poll_round_trip_seconds","gauge","Time from the start of the last poll until the answer.","",self.roundTrip()),
+                  ("xtend_connect_seconds","gauge","Time needed for the last new connection.","",self.connectTime),
+                  ("xtend_json_parse_seconds","gauge","JSON parse time of the last answer.","",self.parseTime)]
+        for deviceType in self.decodeTimes:
+            samples.append(("xtend_decode_seconds","gauge","Decode time of the last poll by device type.",'type="'+deviceType+'"',self.decodeTimes[deviceType]))
+        for deviceType in self.decodeTotals:
+            samples.append(("xtend_decode_seconds_total","counter","Decode time since the start by device type.",'type="'+deviceType+'"',self.decodeTotals[deviceType]))
+        samples+=[("xtend_device_updates_total","counter","Device updates written and skipped as unchanged.",'result="written"',self.updatesDone),
+                  ("xtend_device_updates_total","counter","Device updates written and skipped as unchanged.",'result="skipped"',self.updatesSkipped),
+                  ("xtend_device_update_seconds_total","counter","Time spent in device Update() calls.","",self.updateTime)]
+        for Dev in sorted(self.invalidValues):
+            samples.append(("xtend_invalid_values_total","counter","Invalid values (32767) received by field.",'field="'+Dev+'"',self.invalidValues[Dev]))
+        return samples
+
+def prometheusText(endpoints): # the metrics of all endpoints in the Prometheus text format, labelled with the endpoint name
+    families={} # name : [type, help text, sample lines]
+    for endpoint in endpoints:
+        for name,metricType,helpText,labels,value in endpoint.metrics.samples(endpoint.breakerState):
+            labels='endpoint="'+endpoint.name+'"'+(","+labels if labels!="" else "")
+            families.setdefault(name,[metricType,helpText,[]])[2].append(name+"{"+labels+"} "+str(value))
+    lines=[]
+    for name in families:
+        lines+=["# HELP "+name+" "+families[name][1], "# TYPE "+name+" "+families[name][0]]+families[name][2]
+    return "\n".join(lines)+"\n"
+
+class XtendEndpoint: # one Xtend indoor unit: its devices, its connection, the polling state and the circuit breaker
+    def __init__(self, plugin, index, address, port, multiple):
+        self.plugin=plugin # the plugin instance, for the settings and the alerter shared by all endpoints
+        self.index=index
+        self.address=address
+        self.port=port
+        if index==0:
+            self.name="Xtend"
+            self.devicePrefix="XTEND: "
+        else:
+            self.name="Xtend "+str(index+1)
+            self.devicePrefix="XTEND "+str(index+1)+": "
+        self.logPrefix=self.name+": " if multiple else "" # messages only name the endpoint when there are several
+        self.xtendConn=None # Domoticz HTTP connection to the Xtend, created on the first poll
+        self.pollStarted=None # time the outstanding poll was started, None if no poll outstanding
+        self.pollPhase="" # "connecting" or "waiting" for the answer
+        self.phaseStarted=0 # time the current phase started, for the timeouts
+        self.phaseStartedPerf=0 # same, as performance counter for the timing measurements
+        self.pollReused=False # request sent on a connection kept open from a previous poll
+        self.pollKind="poll" # kind of the outstanding request: "poll", "probe" (circuit breaker), "discover" (field discovery) or "keepalive"
+        self.lastRequest=time.time() # time the last request was started
+        self.disconnectPending=None # time a connection was given up on, until its onDisconnect is received
+        self.pollDeferred=False # a poll was due while waiting for that onDisconnect
+        self.linkSamples=deque(maxlen=LinkWindow) # round trip in seconds of the last requests, None for a request without answer
+        self.linkDegraded=False
+        self.breakerState="closed" # "closed": normal polling, "open": polling suspended, "half-open": probe outstanding
+        self.breakerFailures=0 # failed polls in a row
+        self.breakerBackoff=BreakerBackoffMin
+        self.nextProbe=0
+        self.outageStarted=None # time of the first failed poll of the current outage
+        self.activeAlerts={} # kind:code of the alerts sent and not yet solved : code
+        self.alertsSolved={} # kind:code : time the alert was solved, for AlertMinInterval
+        self.writeCache={} # (DeviceID,Unit) : [nValue, sValue, numeric value, time written]
+        self.metrics=XtendMetrics()
+        self.store=None
+        self.derived=None # set by compileDecodePlan
+        self.tierLastPolled=None # tier : time of the last successful poll of the tier, set by compileDecodePlan
+        self.snapshot={} # fieldcode : decoded value, collected during a poll for the sample store
+        self.sampler=None
+        self.deviceGroups=[group for group in plugin.deviceGroups if group!="gas" or index==0] # one gas meter, used with the first Xtend
+        self.gasReader=None
+        self.boilerState=None # key of the gas device the boiler is using gas for, None if the boiler uses no gas
+        self.lastBoilerPoll=None # time of the previous poll with a valid boiler status
+        self.gasIntervals=deque() # [start, end or None while running, key of the gas device] of the boiler activity
+        self.gasLast=None # (time, counter in m3) of the previous gas meter reading
+        self.gasTotals={} # key of the gas device : counter in liters
+        self.cacheKey=address+":"+port # key of this endpoint in the field cache
+        self.fieldClasses=None # fieldcode : "supported", "invalid" or "missing", None if all fields are polled
+        self.firmware=None # software version (47e0) the field classes were discovered with
+        self.discovering=False # field discovery in progress, no normal polls until it is finished
+        self.discoveryRound=0
+        self.discoveryChunks=[] # field lists of the discovery requests
+        self.discoveryIndex=0 # chunk of the outstanding discovery request
+        self.discoveryTally={} # fieldcode : [valid values, invalid values] received during discovery
+        self.discoveredFirmware=None
+        self.states=None # state accounting, see STATEFILE
+        self.energy=None # energy integration, see ENERGYINTEGRATION
+        self.anomaly=None # anomaly detection, see ANOMALYFILE
+        self.statePlan=[] # (key, DeviceID, Unit, unit) of the STATEDEVICES that exist
+        self.rawBuffer=deque(maxlen=RAWBUFFERSIZE) # (time, kind of request, HTTP status, transfer seconds, connection reused, answer as received)
+        self.rawDumped={} # reason : time of the last automatic dump
+        self.lastNotification=None
+
+    def deviceID(self, Unit): # endpoint k uses (k<<8)|Unit in the DeviceID, so the first endpoint keeps the DeviceIDs of older versions
+        return "{:04x}{:04x}".format(self.plugin.Hwid,(self.index<<8)|Unit)
+
+    def createDevices(self): # create any non-existing devices of this endpoint
+        for Dev in DEVSLIST:
+            Unit=DEVSLIST[Dev][0]
+            DeviceID=self.deviceID(Unit)
+            Options=DEVSLIST[Dev][4]
+            if ENERGYINTEGRATION and Dev in ENERGYFIELDS: # the energy is supplied by the plugin
+                Options=dict(Options,EnergyMeterMode='0')
+            if DeviceID not in Devices:
+                Domoticz.Status(f"{self.logPrefix}Creating device for Field {Dev} ...")
+                self.plugin.createDevice(DeviceID,Unit,self.devicePrefix+DEVSLIST[Dev][6],DEVSLIST[Dev][1],DEVSLIST[Dev][2],DEVSLIST[Dev][3],Options,"Xtend field code :"+Dev)
+            elif Dev in ENERGYFIELDS and Devices[DeviceID].Units[Unit].Options.get('EnergyMeterMode')!=Options.get('EnergyMeterMode'):
+                Domoticz.Status(f"{self.logPrefix}Changing energy meter mode of the device for Field {Dev} ...")
+                Devices[DeviceID].Units[Unit].Options=Options
+                Devices[DeviceID].Units[Unit].Update(UpdateOptions=True)
+        if self.plugin.samplingInterval>0 and SAMPLERMINMAX:
+            for Dev in SAMPLERFIELDS:
+                if Dev not in DEVSLIST: continue
+                Type,Subtype,Switchtype,Options=DEVSLIST[Dev][1:5]
+                if Type==243 and Subtype==29: # kwh device, minimum and maximum are shown as power
+                    Type,Subtype,Switchtype,Options=248,1,0,{}
+                for Unit,Label in zip(SAMPLERFIELDS[Dev],["min","max"]):
+                    DeviceID=self.deviceID(Unit)
+                    if DeviceID not in Devices:
+                        Domoticz.Status(f"{self.logPrefix}Creating {Label} device for Field {Dev} ...")
+                        self.plugin.createDevice(DeviceID,Unit,self.devicePrefix+DEVSLIST[Dev][6]+" "+Label,Type,Subtype,Switchtype,Options,"Xtend field code :"+Dev+" "+Label)
+        for Key in DERIVEDMETRICS:
+            if not all(Dev in DEVSLIST for Dev in DERIVEDMETRICS[Key][6]): continue
+            Unit=DERIVEDMETRICS[Key][0]
+            DeviceID=self.deviceID(Unit)
+            if DeviceID not in Devices:
+                Domoticz.Status(f"{self.logPrefix}Creating device {DERIVEDMETRICS[Key][5]} ...")
+                self.plugin.createDevice(DeviceID,Unit,self.devicePrefix+DERIVEDMETRICS[Key][5],DERIVEDMETRICS[Key][1],DERIVEDMETRICS[Key][2],DERIVEDMETRICS[Key][3],DERIVEDMETRICS[Key][4],"Xtend derived metric, fields "+",".join(DERIVEDMETRICS[Key][6]))
+        if STATEFILE!="":
+            for Key in STATEDEVICES:
+                if STATEDEVICES[Key][6] not in DEVSLIST: continue
+                Unit=STATEDEVICES[Key][0]
+                DeviceID=self.deviceID(Unit)
+                if DeviceID not in Devices:
+                    Domoticz.Status(f"{self.logPrefix}Creating device {STATEDEVICES[Key][5]} ...")
+                    self.plugin.createDevice(DeviceID,Unit,self.devicePrefix+STATEDEVICES[Key][5],STATEDEVICES[Key][1],STATEDEVICES[Key][2],STATEDEVICES[Key][3],STATEDEVICES[Key][4],"Xtend state accounting, field "+STATEDEVICES[Key][6])
+        for Key in PLUGINDEVS:
+            if PLUGINDEVS[Key][6] not in self.deviceGroups: continue
+            Unit=PLUGINDEVS[Key][0]
+            DeviceID=self.deviceID(Unit)
+            if DeviceID not in Devices:
+                Domoticz.Status(f"{self.logPrefix}Creating device {PLUGINDEVS[Key][5]} ...")
+                self.plugin.createDevice(DeviceID,Unit,self.devicePrefix+PLUGINDEVS[Key][5],PLUGINDEVS[Key][1],PLUGINDEVS[Key][2],PLUGINDEVS[Key][3],PLUGINDEVS[Key][4],"Xtend plugin device")
+
+    def start(self): # compile the decode plan and start the sample store and the sampler
+        if FIELDCACHE!="":
+            cached=self.plugin.fieldCache.get(self.cacheKey)
+            if cached is not None and time.time()-cached["time"]<DiscoveryMaxAge*86400:
+                self.firmware=cached["firmware"]
+                self.fieldClasses=cached["fields"]
+            else:
+                self.startDiscovery()
+        if ENERGYINTEGRATION:
+            initial={} # fieldcode : energy in Wh on the device
+            for Dev in ENERGYFIELDS:
+                Unit=DEVSLIST[Dev][0]
+                try:
+                    initial[Dev]=float(Devices[self.deviceID(Unit)].Units[Unit].sValue.split(";")[1])
+                except (KeyError, IndexError, ValueError):
+                    initial[Dev]=0.0
+            self.energy=XtendEnergy(self.dataFile(ENERGYFILE),initial)
+        self.compileDecodePlan()
+        if STOREFILE!="":
+            try:
+                self.store=XtendStore(self.dataFile(STOREFILE),[Dev for Dev in DEVSLIST if Dev not in STRINGFIELDS],list(ENUMTEXTS)+list(BITFLAGS)+["7940"])
+            except Exception as error:
+                Domoticz.Error(self.logPrefix+"Sample store could not be opened: "+str(error))
+        self.updateSampler()
+        if STATEFILE!="":
+            self.states=XtendStates(self.dataFile(STATEFILE))
+            for Key in STATEDEVICES:
+                Unit=STATEDEVICES[Key][0]
+                DeviceID=self.deviceID(Unit)
+                if DeviceID in Devices:
+                    self.statePlan.append((Key,DeviceID,Unit,Devices[DeviceID].Units[Unit]))
+        if ANOMALYFILE!="":
+            self.anomaly=XtendAnomaly(self.dataFile(ANOMALYFILE))
+            for Dev in self.anomaly.fields: # alerts active before the restart are still active, without sending them again
+                if Dev in ANOMALYFIELDS and self.anomaly.fields[Dev]["alert"] and self.plugin.notificationsOn:
+                    text=Dev+" "+DEVSLIST[Dev][6]
+                    self.activeAlerts["anomaly:"+text]=text
+        if "gas" in self.deviceGroups:
+            for Key in set(GASSTATES.values())|{"gascooking"}:
+                Unit=PLUGINDEVS[Key][0]
+                try:
+                    self.gasTotals[Key]=int(float(Devices[self.deviceID(Unit)].Units[Unit].sValue or 0))
+                except (KeyError, ValueError):
+                    self.gasTotals[Key]=0
+            self.gasReader=XtendGasReader(self.plugin.gasMeterIdx)
+            self.gasReader.start()
+
+    def dataFile(self, fileName): # path of a file of this endpoint in the plugin folder, with the endpoint number added for the second and later endpoints
+        return endpointFile(Parameters["HomeFolder"]+fileName,self.index)
+
+    def updateSampler(self): # start, change or stop the sampler to match the sampler plan
+        fields=list(self.samplerPlan)
+        if self.sampler is not None:
+            if len(self.samplerPlan)==0:
+                self.sampler.stop()
+                self.sampler=None
+            else:
+                self.sampler.fields=fields
+        elif self.plugin.samplingInterval>0 and len(self.samplerPlan)>0:
+            self.sampler=XtendSampler(XtendFetcher(self.address,self.port), fields, self.plugin.samplingInterval)
+            self.sampler.start()
+            Domoticz.Status(self.logPrefix+"High resolution sampling started for fields "+",".join(self.samplerPlan))
+
+    def stop(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self.gasReader is not None:
+            self.gasReader.stop()
+        if self.store is not None:
+            self.store.close()
+        if self.states is not None:
+            self.saveStates(time.time())
+        if self.energy is not None:
+            self.saveEnergy(time.time())
+        if self.anomaly is not None:
+            self.saveAnomaly(time.time())
+        if self.xtendConn is not None and (self.xtendConn.Connected() or self.xtendConn.Connecting()):
+            self.xtendConn.Disconnect()
+
+    def compileDecodePlan(self): # translate DEVSLIST once into a list of decode steps, so a poll only has to walk this list
+        self.decodePlan={} # tier : list of decode steps
+        self.tierFields={} # tier : the field list for the url
+        self.samplerPlan={} # fieldcode : (decode step, decode steps of the minimum and maximum devices), for sampled fields
+        self.recheckFields=[] # fields classified "invalid" by the field discovery
+        self.deviceTypes={Dev:str(DEVSLIST[Dev][1])+"_"+str(DEVSLIST[Dev][2]) for Dev in DEVSLIST} # fieldcode : "Type_Subtype", the label of the decode times
+        for tier in POLLTIERS:
+            self.decodePlan[tier]=[]
+            self.tierFields[tier]=""
+        for Dev in DEVSLIST:
+            if self.fieldClasses is not None and self.fieldClasses.get(Dev,"supported")!="supported" and Dev!="47e0":
+                if self.fieldClasses[Dev]=="invalid": # requested without decoding until a valid value is received
+                    self.recheckFields.append(Dev)
+                    self.tierFields[DiscoveryRecheckTier]+=Dev+","
+                continue # the software version is always polled, to detect a firmware update
+            Unit=DEVSLIST[Dev][0]
+            DeviceID=self.deviceID(Unit)
+            Type=DEVSLIST[Dev][1]
+            Subtype=DEVSLIST[Dev][2]
+            if DeviceID not in Devices:
+                Domoticz.Error(f"{self.logPrefix}Device for field {Dev} does not exist, field will not be decoded.")
+                continue
+            if Type==243 and Subtype==29 and self.energy is not None and Dev in ENERGYFIELDS: # kwh device, energy integrated by the plugin
+                decoder,arg=decodeEnergy,(self.energy,Dev,not (self.plugin.samplingInterval>0 and Dev in SAMPLERFIELDS))
+            else:
+                decoder,arg=fieldDecoder(Dev)
+            deadband=None if decoder is decodeEnergy else DEADBANDS.get((Type,Subtype),0) # the energy rises at a steady power, so the texts are compared
+            if self.plugin.samplingInterval>0 and Dev in SAMPLERFIELDS:
+                if decoder in (decodeNumeric,decodeKwh,decodeEnergy):
+                    step=(Dev,DeviceID,Unit,Devices[DeviceID].Units[Unit],decoder,arg,deadband)
+                    minmaxSteps=[]
+                    for minmaxUnit in SAMPLERFIELDS[Dev]:
+                        minmaxDeviceID=self.deviceID(minmaxUnit)
+                        if SAMPLERMINMAX and minmaxDeviceID in Devices:
+                            if decoder in (decodeKwh,decodeEnergy): # shown as power in watts
+                                minmaxSteps.append((Dev,minmaxDeviceID,minmaxUnit,Devices[minmaxDeviceID].Units[minmaxUnit],decodeNumeric,1,0))
+                            else:
+                                minmaxSteps.append((Dev,minmaxDeviceID,minmaxUnit,Devices[minmaxDeviceID].Units[minmaxUnit],decoder,arg,step[6]))
+                    self.samplerPlan[Dev]=(step,minmaxSteps)
+                    continue
+                Domoticz.Error(f"{self.logPrefix}Field {Dev} is not numeric and can not be sampled, it is polled normally.")
+            tier=FIELDTIERS.get(Dev,"fast")
+            self.decodePlan[tier].append((Dev,DeviceID,Unit,Devices[DeviceID].Units[Unit],decoder,arg,deadband))
+            self.tierFields[tier]+=Dev+","
+        self.derivedPlan=[] # (key, DeviceID, Unit, unit, deadband) of the derived metrics with all fields supported
+        for Key in DERIVEDMETRICS:
+            Unit,Type,Subtype=DERIVEDMETRICS[Key][0:3]
+            DeviceID=self.deviceID(Unit)
+            if DeviceID in Devices and all(Dev in DEVSLIST and (self.fieldClasses is None or self.fieldClasses.get(Dev,"supported")=="supported") for Dev in DERIVEDMETRICS[Key][6]):
+                self.derivedPlan.append((Key,DeviceID,Unit,Devices[DeviceID].Units[Unit],DEADBANDS.get((Type,Subtype),0)))
+        keys=[step[0] for step in self.derivedPlan]
+        if self.derived is None or self.derived.keys!=keys: # a recompile at runtime keeps the integrals of the windowed metrics
+            self.derived=XtendDerived(keys)
+        if self.tierLastPolled is None:
+            self.tierLastPolled=dict.fromkeys(POLLTIERS,0)
+        self.pollTiers=[] # tiers requested by the outstanding poll
+        self.pollURL=""
+
+    def heartbeat(self, pollDue): # called on every heartbeat, pollDue is True when the polling interval has passed
+        self.checkPollTimeout()
+        if self.disconnectPending is not None and time.time()-self.disconnectPending<XtendConnectTimeout: # no new request before the old connection is closed
+            self.pollDeferred=self.pollDeferred or pollDue
+        elif self.breakerState!="closed": # polling suspended, only probe
+            self.probeXtend()
+        elif self.discovering:
+            self.discoverFields()
+        elif pollDue or self.pollDeferred:
+            self.pollDeferred=False
+            if self.sampler is not None:
+                self.publishSamples()
+            self.getXtendData()
+        elif self.pollStarted is None and time.time()-self.lastRequest>=KeepAliveInterval: # keep the Xtend WIFI connection open
+            self.startRequest(XtendAPI+BreakerProbeFields,"keepalive")
+        if self.gasReader is not None:
+            self.classifyGas()
+        self.showLinkState()
+
+    def onConnect(self, Status, Description):
+        if self.pollStarted is not None:
+            if Status==0:
+                self.metrics.connectTime=time.perf_counter()-self.phaseStartedPerf
+                self.sendXtendRequest()
+            else:
+                self.pollStarted=None
+                self.linkResult(None)
+                self.pollFailed("timeout","Failed to connect to Xtend: "+Description)
+
+    def onMessage(self, Data):
+        if self.pollStarted is not None:
+            self.metrics.transferTime=time.perf_counter()-self.phaseStartedPerf
+            self.metrics.connectionReused=self.pollReused
+            self.rawBuffer.append((time.time(),self.pollKind,Data.get("Status"),self.metrics.roundTrip(),self.pollReused,Data.get("Data")))
+            self.pollStarted=None
+            self.linkResult(self.metrics.roundTrip())
+            if self.pollKind=="probe":
+                self.processProbe(Data)
+            elif self.pollKind=="keepalive":
+                self.processKeepAlive(Data)
+            elif self.pollKind=="discover":
+                self.processDiscovery(Data)
+            else:
+                self.processXtendData(Data)
+
+    def onDisconnect(self):
+        if self.disconnectPending is not None: # the connection given up on by checkPollTimeout, that poll has already failed
+            self.disconnectPending=None
+            return
+        if self.pollStarted is not None: # connection closed before an answer was received
+            if self.pollReused: # the connection kept open was dropped, for example by the Xtend WIFI, try once on a new connection
+                self.pollReused=False
+                self.connectXtend()
+                return
+            self.pollStarted=None
+            self.linkResult(None)
+            self.pollFailed("dataerror","Xtend closed the connection without sending data.")
+
+    def getXtendData(self): # start an asynchronous request, the answer is handled in onMessage
+        Domoticz.Debug(self.logPrefix+"getXtendData called")
+        if self.pollStarted is not None: # previous poll still outstanding and not yet timed out
+            return
+        now=time.time()
+        self.pollTiers=[tier for tier in POLLTIERS if self.tierFields[tier]!="" and now-self.tierLastPolled[tier]>=POLLTIERS[tier]]
+        self.startRequest(XtendAPI+"".join(self.tierFields[tier] for tier in self.pollTiers),"poll")
+
+    def probeXtend(self): # send a small request to find out whether the Xtend can be reached again
+        if self.pollStarted is None and time.time()>=self.nextProbe:
+            self.breakerState="half-open"
+            self.startRequest(XtendAPI+BreakerProbeFields,"probe")
+
+    def startRequest(self, url, kind):
+        self.pollStarted=time.time()
+        self.lastRequest=self.pollStarted
+        self.pollURL=url
+        self.pollKind=kind
+        if self.xtendConn is None:
+            self.xtendConn=Domoticz.Connection(Name=self.name, Transport="TCP/IP", Protocol="HTTP", Address=self.address, Port=self.port)
+        self.pollReused=self.xtendConn.Connected()
+        if self.pollReused:
+            self.sendXtendRequest()
+        else:
+            self.connectXtend()
+
+    def connectXtend(self): # open a new connection, the request is sent from onConnect
+        self.pollPhase="connecting"
+        self.phaseStarted=time.time()
+        self.phaseStartedPerf=time.perf_counter()
+        if not self.xtendConn.Connecting():
+            self.xtendConn.Connect()
+
+    def sendXtendRequest(self):
+        self.pollPhase="waiting"
+        self.phaseStarted=time.time()
+        self.phaseStartedPerf=time.perf_counter()
+        self.xtendConn.Send({"Verb":"GET", "URL":self.pollURL, "Headers":{"Host":self.address, "Accept":"application/json", "Connection":"keep-alive"}})
+
+    def checkPollTimeout(self): # give up on a poll that did not connect or did not get an answer in time
+        if self.pollStarted is None:
+            return
+        if self.pollPhase=="connecting":
+            timeout=XtendConnectTimeout
+        else:
+            timeout=XtendReadTimeout
+        if time.time()-self.phaseStarted>timeout:
+            self.pollStarted=None
+            self.linkResult(None)
+            if self.xtendConn.Connected() or self.xtendConn.Connecting():
+                self.disconnectPending=time.time()
+                self.xtendConn.Disconnect()
+            if self.pollPhase=="connecting":
+                self.pollFailed("timeout","Timeout on connecting to the Xtend. Check connection.")
+            else:
+                self.pollFailed("timeout","Timeout on getting Xtend data. Check connection.")
+
+    def processXtendData(self, Data): # decode the HTTP answer of the Xtend and load the values onto the devices
+        try:
+            if Data.get("Status")=="200":
+                metrics=self.metrics
+                started=time.perf_counter()
+                responseJson=json.loads(Data["Data"])
+                metrics.parseTime=time.perf_counter()-started
+                if self.plugin.showDataLog: Domoticz.Log(self.logPrefix+str(responseJson["stats"]))
+                stats=responseJson["stats"]
+                updatesAtStart=metrics.updatesDone
+                updateTimeAtStart=metrics.updateTime
+                decodeTimes={}
+                metrics.pollInvalid=0
+                for tier in self.pollTiers:
+                    for Dev,DeviceID,Unit,unitObj,decoder,arg,deadband in self.decodePlan[tier]:
+                        rawValue=stats[Dev]
+                        if rawValue==INVALIDVALUE: # invalid value will not processed
+                            metrics.invalidValues[Dev]=metrics.invalidValues.get(Dev,0)+1
+                            metrics.pollInvalid+=1
+                        else:
+                            started=time.perf_counter()
+                            decoded=decoder(rawValue,arg)
+                            deviceType=self.deviceTypes[Dev]
+                            decodeTimes[deviceType]=decodeTimes.get(deviceType,0.0)+time.perf_counter()-started
+                            if decoded is not None:
+                                if Dev not in STRINGFIELDS: # the snapshot holds numbers only, as stored and exported
+                                    self.snapshot[Dev]=decoded[0] if decoded[2] is None else decoded[2]
+                                if unitObj.Used==1:
+                                    self.updateUnit(DeviceID,Unit,decoded[0],decoded[1],decoded[2],deadband,unitObj)
+                    self.tierLastPolled[tier]=time.time()
+                if len(self.derivedPlan)>0:
+                    results=self.derived.evaluate(time.time(),self.snapshot)
+                    for Key,DeviceID,Unit,unitObj,deadband in self.derivedPlan:
+                        if Key in results and unitObj.Used==1:
+                            value=round(results[Key],1)
+                            self.updateUnit(DeviceID,Unit,int(value),str(value),value,deadband,unitObj)
+                if self.store is not None:
+                    self.store.append(time.time(),self.snapshot)
+                if self.plugin.exporter is not None:
+                    self.plugin.exporter.send(self.name,time.time(),self.snapshot)
+                if self.anomaly is not None:
+                    self.checkAnomalies(time.time(),self.snapshot)
+                self.snapshot={}
+                for deviceType in decodeTimes:
+                    metrics.decodeTotals[deviceType]=metrics.decodeTotals.get(deviceType,0.0)+decodeTimes[deviceType]
+                metrics.decodeTimes=decodeTimes
+                metrics.pollUpdates=metrics.updatesDone-updatesAtStart
+                metrics.pollUpdateTime=metrics.updateTime-updateTimeAtStart
+                if metrics.pollInvalid>=RawInvalidBurst:
+                    self.dumpRaw("invalid",str(metrics.pollInvalid)+" invalid values")
+                self.pollSucceeded()
+                if self.gasReader is not None:
+                    self.trackBoilerState(time.time(),stats.get("843a",INVALIDVALUE))
+                if self.states is not None:
+                    self.trackStates(time.time(),stats)
+                if self.energy is not None:
+                    self.checkEnergy(time.time())
+                notificationCode=stats.get("7940",INVALIDVALUE)
+                if notificationCode!=INVALIDVALUE:
+                    for Key in list(self.activeAlerts): # a notification is solved when the code is gone or changed
+                        if Key.startswith("notification:") and Key!="notification:"+str(notificationCode):
+                            self.solveAlert("notification",self.activeAlerts[Key])
+                    if notificationCode!=255:
+                        Domoticz.Error(self.logPrefix+"Notification code received:"+str(notificationCode)+" Check manual.")
+                        self.raiseAlert("notification",str(notificationCode))
+                        if notificationCode!=self.lastNotification:
+                            self.dumpRaw("notification","code "+str(notificationCode))
+                    self.lastNotification=notificationCode
+            else:
+                raise Exception("HTTP status "+str(Data.get("Status")))
+        except Exception as error:
+            self.pollFailed("dataerror","No proper Xtend data received. Check connection.")
+            self.dumpRaw("dataerror",type(error).__name__+" "+str(error))
+            return
+        firmware=stats.get("47e0",INVALIDVALUE)
+        if FIELDCACHE!="" and self.firmware is not None and firmware!=INVALIDVALUE and str(firmware)!=self.firmware:
+            Domoticz.Status(self.logPrefix+"Xtend software version changed from "+self.firmware+" to "+str(firmware)+", fields are discovered again.")
+            self.startDiscovery()
+        elif DiscoveryRecheckTier in self.pollTiers and len(self.recheckFields)>0:
+            self.recheckInvalid(stats)
+
+    def recheckInvalid(self, stats): # fields classified "invalid" that now have a valid value are polled again
+        fields=[Dev for Dev in self.recheckFields if stats.get(Dev,INVALIDVALUE)!=INVALIDVALUE]
+        if len(fields)==0:
+            return
+        Domoticz.Status(self.logPrefix+"Fields with a valid value again, polled from now on: "+", ".join(Dev+" ("+DEVSLIST[Dev][6]+")" for Dev in fields))
+        for Dev in fields:
+            self.fieldClasses[Dev]="supported"
+        if self.cacheKey in self.plugin.fieldCache:
+            self.plugin.fieldCache[self.cacheKey]["fields"]=self.fieldClasses
+            self.plugin.saveFieldCache()
+        self.compileDecodePlan()
+        self.updateSampler()
+
+    def pollSucceeded(self): # an answer was received: end of an outage
+        self.metrics.pollDone("ok")
+        self.breakerFailures=0
+        self.outageStarted=None
+        self.solveAlert("timeout")
+        self.solveAlert("dataerror")
+
+    def startDiscovery(self):
+        Domoticz.Status(self.logPrefix+"Discovering the fields supported by the Xtend, polling starts in "+str(DiscoveryRounds)+" heartbeats.")
+        self.discovering=True
+        self.discoveryRound=0
+        self.discoveryTally={}
+        self.discoveredFirmware=None
+        fields=list(DEVSLIST)+[Dev for Dev in CANDIDATEFIELDS if Dev not in DEVSLIST]
+        self.discoveryChunks=[fields[index:index+DiscoveryChunk] for index in range(0,len(fields),DiscoveryChunk)]
+
+    def discoverFields(self): # start a discovery round, the next chunks are requested from processDiscovery
+        if self.pollStarted is None:
+            self.discoveryIndex=0
+            self.startRequest(XtendAPI+",".join(self.discoveryChunks[0]),"discover")
+
+    def processDiscovery(self, Data): # count the valid and invalid values of a discovery chunk and request the next chunk
+        try:
+            if Data.get("Status")!="200":
+                raise Exception
+            stats=json.loads(Data["Data"])["stats"]
+        except Exception as error:
+            self.pollFailed("dataerror","No proper Xtend data received on field discovery. Check connection.")
+            self.dumpRaw("dataerror",type(error).__name__+" "+str(error))
+            return
+        self.pollSucceeded()
+        for Dev in self.discoveryChunks[self.discoveryIndex]:
+            tally=self.discoveryTally.setdefault(Dev,[0,0])
+            if Dev in stats:
+                if stats[Dev]==INVALIDVALUE:
+                    tally[1]+=1
+                else:
+                    tally[0]+=1
+                    if Dev=="47e0":
+                        self.discoveredFirmware=str(stats[Dev])
+        self.discoveryIndex+=1
+        if self.discoveryIndex<len(self.discoveryChunks):
+            self.startRequest(XtendAPI+",".join(self.discoveryChunks[self.discoveryIndex]),"discover")
+            return
+        self.discoveryRound+=1
+        if self.discoveryRound>=DiscoveryRounds:
+            self.finishDiscovery()
+
+    def finishDiscovery(self): # classify the fields, cache the result and start polling the supported fields
+        self.discovering=False
+        fieldClasses={}
+        for Dev in self.discoveryTally:
+            valid,invalid=self.discoveryTally[Dev]
+            fieldClasses[Dev]="supported" if valid>0 else ("invalid" if invalid>0 else "missing")
+        if not any(fieldClasses.get(Dev)=="supported" for Dev in DEVSLIST if Dev!="47e0"):
+            Domoticz.Error(self.logPrefix+"Field discovery found no supported fields, all fields are polled.")
+            self.fieldClasses=None
+        else:
+            self.fieldClasses=fieldClasses
+            self.firmware=self.discoveredFirmware
+            Domoticz.Status(self.logPrefix+"Field discovery for software version "+str(self.firmware)+": "+str(sum(1 for Dev in DEVSLIST if fieldClasses.get(Dev)=="supported"))+" of "+str(len(DEVSLIST))+" fields supported.")
+            for fieldClass,text in [("invalid","always invalid during the discovery, until a valid value is received"),("missing","unknown to the Xtend")]:
+                fields=[Dev for Dev in DEVSLIST if fieldClasses.get(Dev)==fieldClass and Dev!="47e0"]
+                if len(fields)>0:
+                    Domoticz.Status(self.logPrefix+"Fields "+text+", not polled: "+", ".join(Dev+" ("+DEVSLIST[Dev][6]+")" for Dev in fields))
+            candidates=[Dev for Dev in CANDIDATEFIELDS if Dev not in DEVSLIST and fieldClasses.get(Dev)=="supported"]
+            if len(candidates)>0:
+                Domoticz.Status(self.logPrefix+"Supported fields not in DEVSLIST: "+", ".join(Dev+" ("+CANDIDATEFIELDS[Dev]+")" for Dev in candidates))
+            if self.firmware is not None:
+                self.plugin.fieldCache[self.cacheKey]={"firmware":self.firmware, "time":int(time.time()), "fields":fieldClasses}
+                self.plugin.saveFieldCache()
+        self.compileDecodePlan()
+        self.updateSampler()
+        self.getXtendData()
+
+    def publishSamples(self): # load the mean, minimum and maximum of the samples taken since the previous poll onto the devices
+        fieldValues={}
+        while True:
+            try:
+                sampleTime,stats=self.sampler.samples.popleft()
+            except IndexError:
+                break
+            for Dev in self.samplerPlan:
+                rawValue=stats.get(Dev)
+                if rawValue is not None and rawValue!=INVALIDVALUE:
+                    fieldValues.setdefault(Dev,[]).append(rawValue)
+                    if self.energy is not None and Dev in ENERGYFIELDS: # integrated at the time of every sample
+                        self.energy.add(Dev,sampleTime,rawValue)
+        for Dev in fieldValues:
+            values=fieldValues[Dev]
+            step,minmaxSteps=self.samplerPlan[Dev]
+            for (Dev,DeviceID,Unit,unitObj,decoder,arg,deadband),rawValue in zip([step]+minmaxSteps,[round(sum(values)/len(values),1),min(values),max(values)]):
+                decoded=decoder(rawValue,arg)
+                if decoded is not None:
+                    if unitObj is step[3]:
+                        self.snapshot[Dev]=decoded[2]
+                    if unitObj.Used==1:
+                        self.updateUnit(DeviceID,Unit,decoded[0],decoded[1],decoded[2],deadband,unitObj)
+        if self.sampler.errors>0:
+            Domoticz.Error(self.logPrefix+"High resolution sampling: "+str(self.sampler.errors)+" failed requests since the previous poll.")
+            self.sampler.errors=0
+
+    def trackBoilerState(self, now, rawValue): # keep the periods the boiler used gas for heating or hot water, from field 843a
+        if rawValue==INVALIDVALUE:
+            return
+        state=GASSTATES.get(rawValue)
+        if state!=self.boilerState:
+            changed=now if self.lastBoilerPoll is None else (self.lastBoilerPoll+now)/2 # the change happened between two polls
+            if len(self.gasIntervals)>0 and self.gasIntervals[-1][1] is None:
+                self.gasIntervals[-1][1]=changed
+            if state is not None:
+                self.gasIntervals.append([changed,None,state])
+            self.boilerState=state
+        self.lastBoilerPoll=now
+
+    def trackStates(self, now, stats): # count the time in state and load the totals onto the state devices
+        if self.states.update(now,stats):
+            self.saveStates(now)
+        for Key,DeviceID,Unit,unitObj in self.statePlan:
+            if unitObj.Used==1:
+                value=self.states.value(*STATEDEVICES[Key][6:9])
+                if value is not None:
+                    self.updateUnit(DeviceID,Unit,int(value),str(value),value,0,unitObj)
+
+    def onCommand(self, Unit, Command):
+        if Unit==PLUGINDEVS["rawdump"][0]:
+            self.dumpRaw("on demand")
+
+    def dumpRaw(self, reason, detail=""): # append the answers in the ring buffer to RAWDUMPFILE
+        now=time.time()
+        if reason!="on demand":
+            if now-self.rawDumped.get(reason,0)<RawDumpMinInterval:
+                return
+            self.rawDumped[reason]=now
+        lines=[json.dumps({"dump":reason, "detail":detail, "endpoint":self.name, "address":self.cacheKey, "time":time.strftime("%Y-%m-%d %H:%M:%S",time.localtime(now))})]
+        for entryTime,kind,status,seconds,reused,data in self.rawBuffer:
+            lines.append(json.dumps({"time":time.strftime("%Y-%m-%d %H:%M:%S",time.localtime(entryTime)), "kind":kind, "status":status, "ms":round(seconds*1000,1),
+                                     "reused":reused, "data":data.decode("utf-8","replace") if isinstance(data,bytes) else str(data)}))
+        path=os.path.join(Parameters["HomeFolder"],RAWDUMPFILE)
+        try:
+            with open(path,"a") as fileHandle:
+                fileHandle.write("\n".join(lines)+"\n")
+            if os.path.getsize(path)>RawDumpMaxBytes:
+                rotateFile(path,RawDumpKeep)
+            Domoticz.Status(self.logPrefix+"Last "+str(len(self.rawBuffer))+" Xtend answers written to "+RAWDUMPFILE+" ("+reason+(", "+detail if detail!="" else "")+").")
+        except OSError as error:
+            Domoticz.Error(self.logPrefix+"Raw answers could not be written: "+str(error))
+
+    def checkEnergy(self, now): # report rejected power values and write the energy counters when due
+        if len(self.energy.outliers)>0:
+            Domoticz.Error(self.logPrefix+"Energy integration, power values rejected as outlier: "+", ".join(Dev+" "+str(self.energy.outliers[Dev])+"x" for Dev in self.energy.outliers))
+            self.energy.outliers={}
+        if now-self.energy.lastSave>=EnergySaveInterval:
+            self.saveEnergy(now)
+
+    def saveEnergy(self, now):
+        try:
+            self.energy.save(now)
+        except OSError as error:
+            Domoticz.Error(self.logPrefix+"Energy counters could not be written: "+str(error))
+
+    def checkAnomalies(self, now, values): # raise or solve the anomaly alerts and write the baselines when due
+        changes=self.anomaly.update(now,values)
+        for Dev in changes:
+            raised,zScore,slope=changes[Dev]
+            text=Dev+" "+DEVSLIST[Dev][6]
+            if raised:
+                Domoticz.Error(self.logPrefix+"Anomaly on "+text+": value "+str(values[Dev])+", z-score "+str(round(zScore,1))+", change "+str(round(slope,2))+" per minute.")
+                self.raiseAlert("anomaly",text)
+            else:
+                Domoticz.Status(self.logPrefix+"Anomaly on "+text+" solved.")
+                self.solveAlert("anomaly",text)
+        if now-self.anomaly.lastSave>=AnomalySaveInterval:
+            self.saveAnomaly(now)
+
+    def saveAnomaly(self, now):
+        try:
+            self.anomaly.save(now)
+        except OSError as error:
+            Domoticz.Error(self.logPrefix+"Anomaly baselines could not be written: "+str(error))
+
+    def saveStates(self, now):
+        try:
+            self.states.save(now)
+        except OSError as error:
+            Domoticz.Error(self.logPrefix+"State accounting could not be written: "+str(error))
+
+    def classifyGas(self): # split each increase of the gas meter over the gas devices by the boiler activity in that period
+        now=time.time()
+        while True:
+            try:
+                readTime,counter=self.gasReader.readings.popleft()
+            except IndexError:
+                break
+            if self.gasLast is not None and counter>self.gasLast[1]:
+                liters=int(round((counter-self.gasLast[1])*1000))
+                activity={} # key of the gas device : seconds of boiler activity in the period of the increase
+                for start,end,Key in self.gasIntervals:
+                    overlap=min(readTime,now if end is None else end)-max(self.gasLast[0],start)
+                    if overlap>0:
+                        activity[Key]=activity.get(Key,0)+overlap
+                if len(activity)==0:
+                    split={"gascooking":liters}
+                else:
+                    split={}
+                    for Key in activity:
+                        split[Key]=int(round(liters*activity[Key]/sum(activity.values())))
+                    split[Key]+=liters-sum(split.values()) # rounding remainder
+                for Key in split:
+                    if split[Key]>0:
+                        self.gasTotals[Key]+=split[Key]
+                        self.updatePluginDevice(Key,0,str(self.gasTotals[Key]),self.gasTotals[Key])
+                Domoticz.Log(self.logPrefix+"Gas meter increase of "+str(liters)+" liter counted as "+", ".join(Key+" "+str(split[Key]) for Key in split))
+            self.gasLast=(readTime,counter)
+        while len(self.gasIntervals)>0 and self.gasIntervals[0][1] is not None and self.gasIntervals[0][1]<now-GasIntervalKeep:
+            self.gasIntervals.popleft()
+        if self.gasReader.errors>0:
+            Domoticz.Error("P1 gas meter "+str(self.plugin.gasMeterIdx)+" could not be read "+str(self.gasReader.errors)+" times, check the idx and that Domoticz accepts requests from 127.0.0.1 without login.")
+            self.gasReader.errors=0
+
+    def updateUnit(self, DeviceID, Unit, nValue, sValue, numericValue=None, deadband=0, unitObj=None): # update a device unless its value is unchanged, deadband None compares the texts
+        now=time.time()
+        cached=self.writeCache.get((DeviceID,Unit))
+        if cached is not None and now-cached[3]<UpdateMaxAge:
+            if numericValue is not None and cached[2] is not None and deadband is not None:
+                unchanged=abs(numericValue-cached[2])<=deadband
+            else:
+                unchanged=(nValue==cached[0] and sValue==cached[1])
+            if unchanged:
+                self.metrics.updatesSkipped+=1
+                return False
+        if unitObj is None:
+            unitObj=Devices[DeviceID].Units[Unit]
+        unitObj.nValue=nValue
+        unitObj.sValue=sValue
+        started=time.perf_counter()
+        unitObj.Update()
+        self.metrics.updateTime+=time.perf_counter()-started
+        self.writeCache[(DeviceID,Unit)]=[nValue,sValue,numericValue,now]
+        self.metrics.updatesDone+=1
+        return True
+
+    def processProbe(self, Data): # a probe was answered: close the circuit breaker and resume polling
+        try:
+            if Data.get("Status")!="200" or not isinstance(json.loads(Data["Data"])["stats"],dict):
+                raise Exception
+        except:
+            self.pollFailed("dataerror","No proper answer on Xtend probe.")
+            return
+        Domoticz.Status(self.logPrefix+"Xtend reachable again after an outage of "+str(int((time.time()-self.outageStarted)/60))+" minutes, polling resumed.")
+        self.breakerState="closed"
+        self.breakerFailures=0
+        self.breakerBackoff=BreakerBackoffMin
+        self.outageStarted=None # a failing next poll starts a new outage
+        if self.sampler is not None:
+            self.sampler.paused=False
+        self.showLinkState()
+        if self.discovering:
+            self.discoverFields()
+        else:
+            self.getXtendData()
+
+    def processKeepAlive(self, Data):
+        try:
+            if Data.get("Status")!="200" or not isinstance(json.loads(Data["Data"])["stats"],dict):
+                raise Exception
+        except:
+            self.pollFailed("dataerror","No proper answer on Xtend keep-alive.")
+
+    def linkResult(self, roundTrip): # a request was answered after roundTrip seconds, or not answered (None)
+        self.linkSamples.append(roundTrip)
+        answered=[sample for sample in self.linkSamples if sample is not None]
+        loss=100.0*(len(self.linkSamples)-len(answered))/len(self.linkSamples)
+        averageTrip=sum(answered)/len(answered)*1000 if len(answered)>0 else 0.0
+        jitter=sum(abs(second-first) for first,second in zip(answered,answered[1:]))/(len(answered)-1)*1000 if len(answered)>1 else 0.0
+        for Key,value in [("linkrtt",averageTrip),("linkjitter",jitter),("linkloss",loss)]:
+            value=round(value,1)
+            self.updatePluginDevice(Key,0,str(value),value)
+        if self.breakerState!="closed" or len(self.linkSamples)<LinkWindow//2: # an outage has its own alerts
+            return
+        degraded=(loss>=LinkLossWarning or averageTrip>=LinkRttWarning)
+        if degraded and not self.linkDegraded:
+            Domoticz.Error(self.logPrefix+"Xtend connection degraded: average round trip {:.0f} ms, loss {:.0f}% over the last {} requests.".format(averageTrip,loss,len(self.linkSamples)))
+            self.raiseAlert("linkquality")
+        elif not degraded and self.linkDegraded:
+            Domoticz.Status(self.logPrefix+"Xtend connection quality normal again.")
+            self.solveAlert("linkquality")
+        self.linkDegraded=degraded
+
+    def pollFailed(self, kind, message): # a poll or probe failed, kind is "timeout" or "dataerror"
+        now=time.time()
+        if self.pollKind=="keepalive": # no poll was missed, the failure shows in the link loss
+            Domoticz.Log(self.logPrefix+"Xtend keep-alive failed ("+message+").")
+            return
+        if self.pollKind=="probe": # still no connection, wait longer before the next probe
+            self.breakerState="open"
+            self.breakerBackoff=min(self.breakerBackoff*2,BreakerBackoffMax)
+            self.nextProbe=now+self.breakerBackoff
+            Domoticz.Log(self.logPrefix+"Xtend probe failed ("+message+"), next probe in "+str(self.breakerBackoff)+" seconds.")
+            self.raiseAlert(kind,rateLimited=False) # the outage lasts, an alert suppressed so far is sent now
+            return
+        Domoticz.Error(self.logPrefix+message)
+        self.metrics.pollDone(kind)
+        self.raiseAlert(kind)
+        if self.outageStarted is None:
+            self.outageStarted=now
+        self.breakerFailures+=1
+        if self.breakerFailures>=BreakerThreshold:
+            self.breakerState="open"
+            self.breakerBackoff=BreakerBackoffMin
+            self.nextProbe=now+self.breakerBackoff
+            self.raiseAlert(kind,rateLimited=False) # a new outage is always alerted, the rate limit is only for a flapping connection
+            if self.sampler is not None:
+                self.sampler.paused=True
+            Domoticz.Error(self.logPrefix+"Xtend failed "+str(self.breakerFailures)+" times in a row, polling suspended. Probing every "+str(BreakerBackoffMin)+" to "+str(BreakerBackoffMax)+" seconds.")
+
+    def showLinkState(self): # breaker state and time in outage on the "Link state" device
+        if self.outageStarted is None:
+            linkState=self.breakerState.upper()
+        else:
+            linkState=self.breakerState.upper()+", outage "+str(int((time.time()-self.outageStarted)/60))+" min"
+        self.updatePluginDevice("linkstate",0,linkState)
+
+    def publishMetrics(self): # load the poll loop measurements onto the diagnostic devices
+        metrics=self.metrics
+        for Key,value in [("rtt",metrics.roundTrip()*1000), ("parsetime",metrics.parseTime*1000), ("decodetime",sum(metrics.decodeTimes.values())*1000),
+                          ("updates",metrics.pollUpdates), ("updatetime",metrics.pollUpdateTime*1000), ("invalid",metrics.pollInvalid), ("errorrate",metrics.errorRate())]:
+            value=round(value,1)
+            self.updatePluginDevice(Key,0,str(value),value)
+
+    def updatePluginDevice(self, Key, nValue, sValue, numericValue=None, deadband=0):
+        Unit=PLUGINDEVS[Key][0]
+        DeviceID=self.deviceID(Unit)
+        if DeviceID in Devices and Devices[DeviceID].Units[Unit].Used==1:
+            self.updateUnit(DeviceID,Unit,nValue,sValue,numericValue,deadband)
+
+    def raiseAlert(self, kind, code="", rateLimited=True): # queue an email alert, unless the same alert is still active or was solved recently
+        Key=kind+":"+code
+        if not self.plugin.notificationsOn or Key in self.activeAlerts:
+            return
+        if rateLimited and time.time()-self.alertsSolved.get(Key,0)<AlertMinInterval:
+            return
+        self.activeAlerts[Key]=code
+        self.plugin.alerter.send(self.logPrefix+ALERTTEXTS[kind][0],ALERTTEXTS[kind][1].format(code=code))
+
+    def solveAlert(self, kind, code=""): # queue the "solved" email for an alert that was sent
+        Key=kind+":"+code
+        if Key in self.activeAlerts:
+            del self.activeAlerts[Key]
+            self.alertsSolved[Key]=time.time()
+            self.plugin.alerter.send(self.logPrefix+ALERTTEXTS[kind][2],ALERTTEXTS[kind][3].format(code=code))
 
 class XtendPlugin:
     enabled = False
@@ -185,9 +1358,7 @@ class XtendPlugin:
         return
 
     def onStart(self):
-        Domoticz.Log("onStart called with parameters")
-        for elem in Parameters:
-            Domoticz.Log(str(elem)+" "+str(Parameters[elem]))
+        Domoticz.Log("onStart called with parameters "+", ".join(str(elem)+"="+str(Parameters[elem]) for elem in Parameters if elem!="Password"))
         if int(Parameters["Mode1"])<=30:
             Domoticz.Heartbeat(int(Parameters["Mode1"]))
             self.heartbeatWaits=0
@@ -195,346 +1366,190 @@ class XtendPlugin:
             Domoticz.Heartbeat(30)
             self.heartbeatWaits=int(int(Parameters["Mode1"])/30 - 1)
         self.notificationsOn=(Parameters["Mode2"]=="Yes")
-        self.emailAlertSent=False
+        self.alerter=XtendAlerter()
+        self.alerter.start()
+        self.exporter=None
+        sinks=[]
+        if MQTTBROKER!="":
+            if mqtt is None:
+                Domoticz.Error("MQTT export not started, the paho-mqtt package is not installed (pip3 install paho-mqtt).")
+            else:
+                sinks.append(XtendMqttSink(MQTTBROKER,MQTTTOPIC))
+        if INFLUXFOLDER!="":
+            try:
+                sinks.append(XtendInfluxSink(os.path.join(Parameters["HomeFolder"],INFLUXFOLDER)))
+            except OSError as error:
+                Domoticz.Error("InfluxDB export not started: "+str(error))
+        if len(sinks)>0:
+            self.exporter=XtendExporter(sinks)
+            self.exporter.start()
         self.showDataLog=(Parameters["Mode3"]=="Yes")
         self.heartbeatCounter=0
         self.Hwid=Parameters['HardwareID']
-        # cycle through device list and create any non-existing devices when the plugin/domoticz is started
-        for Dev in DEVSLIST:
-            Unit=DEVSLIST[Dev][0]
-            DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-            Type=DEVSLIST[Dev][1]
-            Subtype=DEVSLIST[Dev][2]
-            Switchtype=DEVSLIST[Dev][3]
-            Options=DEVSLIST[Dev][4]
-            Name="XTEND: "+DEVSLIST[Dev][6]
-            Description="Xtend field code :"+Dev
-            if DeviceID not in Devices:
-                Domoticz.Status(f"Creating device for Field {Dev} ...")
-                if ((Type==243) and (Subtype==29)):
-                    # below code puts an initial svalue on the kwh device and then changes the type to "computed". This is to work around a BUG in Domoticz for computed kwh devices. See issue 6194 on Github.
-                    Domoticz.Unit(DeviceID=DeviceID,Unit=Unit, Name=Name, Type=Type, Subtype=Subtype, Switchtype=Switchtype, Options={}, Used=1, Description=Description).Create()
-                    Devices[DeviceID].Units[Unit].sValue="0;0"
-                    Devices[DeviceID].Units[Unit].Update()
-                    Devices[DeviceID].Units[Unit].Options=Options
-                    Devices[DeviceID].Units[Unit].Update(UpdateOptions=True)
-                else:
-                    Domoticz.Unit(DeviceID=DeviceID,Unit=Unit, Name=Name, Type=Type, Subtype=Subtype, Switchtype=Switchtype, Options=Options, Used=1, Description=Description).Create()
-        for Dev in DEVSLIST:
-            Domoticz.Log("DEVSLIST "+str(DEVSLIST[Dev][0])+DEVSLIST[Dev][6])
-        self.createCONFIGJS()
+        self.samplingInterval=int(Parameters["Mode4"] or 0)
+        self.diagnostics=int(Parameters["Mode6"] or 0) # 0: off, 1: devices, 2: devices and metrics file
+        self.nextMetrics=time.time()+MetricsInterval
+        self.deviceGroups=[""] # groups of PLUGINDEVS to be created and updated
+        if self.diagnostics>0:
+            self.deviceGroups.append("diagnostics")
+        self.gasMeterIdx=Parameters.get("Mode5","").strip() # idx of the P1 gas meter, "" if gas is not classified
+        if self.gasMeterIdx!="":
+            self.deviceGroups.append("gas")
+        addresses=parseEndpoints(Parameters.get("Address",""),Parameters.get("Port","") or XtendPort)
+        if len(addresses)==0: # hardware created with an older version of the plugin
+            addresses=[(XtendIP,XtendPort)]
+        if len(addresses)>MaxEndpoints:
+            Domoticz.Error("Only the first "+str(MaxEndpoints)+" Xtend addresses are used.")
+            addresses=addresses[:MaxEndpoints]
+        self.endpoints=[XtendEndpoint(self,index,address,port,len(addresses)>1) for index,(address,port) in enumerate(addresses)]
+        self.connections={endpoint.name:endpoint for endpoint in self.endpoints} # Connection name : endpoint
+        self.fieldCache={} # endpoint address:port : {"firmware", "time", "fields"}, see FIELDCACHE
+        if FIELDCACHE!="":
+            try:
+                with open(Parameters["HomeFolder"]+FIELDCACHE) as fileHandle:
+                    self.fieldCache=json.load(fileHandle)
+            except (OSError, ValueError): # no cache yet, the fields are discovered
+                pass
+        manifest=self.manifestHash()
+        try:
+            with open(Parameters["HomeFolder"]+MANIFESTFILE) as fileHandle:
+                unchanged=(json.load(fileHandle).get("hash")==manifest and os.path.exists(DASHTICZFILE))
+        except (OSError, ValueError):
+            unchanged=False
+        if unchanged:
+            Domoticz.Log("Devices and Dashticz config unchanged since the previous start.")
+        else:
+            # cycle through device list and create any non-existing devices when the plugin/domoticz is started
+            for endpoint in self.endpoints:
+                endpoint.createDevices()
+            self.createCONFIGJS()
+            try:
+                writeAtomic(Parameters["HomeFolder"]+MANIFESTFILE,json.dumps({"hash":self.manifestHash()}))
+            except OSError as error:
+                Domoticz.Error("Manifest could not be written: "+str(error))
+        for endpoint in self.endpoints:
+            endpoint.start()
+            Domoticz.Status(endpoint.name+" polled at "+endpoint.address+":"+endpoint.port)
+
+    def manifestHash(self): # hash of the device definitions and settings together with the devices of this hardware in Domoticz
+        definitions=[DEVSLIST, PLUGINDEVS, {Key:DERIVEDMETRICS[Key][0:7] for Key in DERIVEDMETRICS}, STATEDEVICES if STATEFILE!="" else {}, ENERGYINTEGRATION, DASHTICZCOLUMNS, DashticzScreen, DASHTICZFILE, self.deviceGroups,
+                     SAMPLERFIELDS if self.samplingInterval>0 and SAMPLERMINMAX else {}, [endpoint.cacheKey for endpoint in self.endpoints]]
+        devices=sorted((DeviceID,Unit,Devices[DeviceID].Units[Unit].ID) for DeviceID in Devices for Unit in Devices[DeviceID].Units)
+        return hashlib.sha1(json.dumps([definitions,devices],sort_keys=True,default=str).encode()).hexdigest()
+
+    def createDevice(self, DeviceID, Unit, Name, Type, Subtype, Switchtype, Options, Description):
+        if ((Type==243) and (Subtype==29)):
+            # below code puts an initial svalue on the kwh device and then changes the type to "computed". This is to work around a BUG in Domoticz for computed kwh devices. See issue 6194 on Github.
+            Domoticz.Unit(DeviceID=DeviceID,Unit=Unit, Name=Name, Type=Type, Subtype=Subtype, Switchtype=Switchtype, Options={}, Used=1, Description=Description).Create()
+            Devices[DeviceID].Units[Unit].sValue="0;0"
+            Devices[DeviceID].Units[Unit].Update()
+            Devices[DeviceID].Units[Unit].Options=Options
+            Devices[DeviceID].Units[Unit].Update(UpdateOptions=True)
+        else:
+            Domoticz.Unit(DeviceID=DeviceID,Unit=Unit, Name=Name, Type=Type, Subtype=Subtype, Switchtype=Switchtype, Options=Options, Used=1, Description=Description).Create()
+
+    def saveFieldCache(self):
+        try:
+            writeAtomic(Parameters["HomeFolder"]+FIELDCACHE,json.dumps(self.fieldCache,indent=1,sort_keys=True))
+        except OSError as error:
+            Domoticz.Error("Field cache could not be written: "+str(error))
 
     def onStop(self):
         Domoticz.Log("onStop called")
+        for endpoint in self.endpoints:
+            endpoint.stop()
+        if self.exporter is not None:
+            self.exporter.stop()
+        self.alerter.stop()
 
     def onConnect(self, Connection, Status, Description):
-        Domoticz.Log("onConnect called")
+        Domoticz.Debug("onConnect called")
+        if Connection.Name in self.connections:
+            self.connections[Connection.Name].onConnect(Status,Description)
 
     def onMessage(self, Connection, Data):
-        Domoticz.Log("onMessage called")
+        Domoticz.Debug("onMessage called")
+        if Connection.Name in self.connections:
+            self.connections[Connection.Name].onMessage(Data)
 
     def onCommand(self, DeviceID, Unit, Command, Level, Color):
         Domoticz.Log("onCommand called for Device " + str(DeviceID) + " Unit " + str(Unit) + ": Parameter '" + str(Command) + "', Level: " + str(Level))
+        for endpoint in self.endpoints:
+            if endpoint.deviceID(Unit)==DeviceID:
+                endpoint.onCommand(Unit,Command)
 
     def onNotification(self, Name, Subject, Text, Status, Priority, Sound, ImageFile):
         Domoticz.Log("Notification: " + Name + "," + Subject + "," + Text + "," + Status + "," + str(Priority) + "," + Sound + "," + ImageFile)
 
     def onDisconnect(self, Connection):
-        Domoticz.Log("onDisconnect called")
+        Domoticz.Debug("onDisconnect called")
+        if Connection.Name in self.connections:
+            self.connections[Connection.Name].onDisconnect()
 
     def onHeartbeat(self):
-        Domoticz.Log("onHeartbeat called")
+        Domoticz.Debug("onHeartbeat called")
         #Domoticz.Log("HBwaits: "+str(self.heartbeatWaits)+", HBcounter: "+str(self.heartbeatCounter))
-        # skip one or more heartbeats if polling interval > 30 seconds
-        if self.heartbeatWaits==self.heartbeatCounter:
-            self.getXtendData()
+        pollDue=(self.heartbeatWaits==self.heartbeatCounter) # skip one or more heartbeats if polling interval > 30 seconds
+        if pollDue:
             self.heartbeatCounter=0
         else:
             self.heartbeatCounter+=1
+        for endpoint in self.endpoints: # all requests are asynchronous, an endpoint that does not answer does not delay the others
+            endpoint.heartbeat(pollDue)
+        if self.diagnostics>0 and time.time()>=self.nextMetrics:
+            self.publishMetrics()
+        if self.alerter.failed>0 or self.alerter.dropped>0:
+            Domoticz.Error("Email alerts: "+str(self.alerter.failed)+" could not be sent to Domoticz, "+str(self.alerter.dropped)+" dropped.")
+            self.alerter.failed=0
+            self.alerter.dropped=0
+        if self.exporter is not None and (self.exporter.failed>0 or self.exporter.dropped>0):
+            Domoticz.Error("Export: "+str(self.exporter.failed)+" batches could not be written, "+str(self.exporter.dropped)+" polls dropped.")
+            self.exporter.failed=0
+            self.exporter.dropped=0
 
-    def getXtendData(self):
-        Domoticz.Log("getXtendData called")
-        self.Hwid=Parameters['HardwareID']
-        try:
-            response=requests.get(APIurl, timeout=5)
-            if response.status_code==200:
-                responseJson=response.json()
-                if self.showDataLog: Domoticz.Log(responseJson["stats"])
-                for Dev in DEVSLIST:
-                    type=DEVSLIST[Dev][1]
-                    subtype=DEVSLIST[Dev][2]
-                    Unit=DEVSLIST[Dev][0]
-                    DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-                    #print(str(responseJson["stats"][Dev]))
-                    if ((Devices[DeviceID].Units[Unit].Used==1) and (str(responseJson["stats"][Dev])!="32767")): # invalid value will not processed
-                        if ((type==80) or # temperature device
-                            (type==113) or # counter device
-                            ((type==243) and (subtype==9)) or # pressure device
-                            ((type==243) and (subtype==30)) or # waterflow device
-                            ((type==243) and (subtype==7)) or # fan device
-                            ((type==243) and (subtype==6)) or # percentage device
-                            ((type==243) and (subtype==31)) # custom device
-                                                    ):
-                            multiplier=DEVSLIST[Dev][5]
-                            if multiplier==1:
-                                fieldValue=round(float(multiplier*responseJson["stats"][Dev]),0)
-                            else:
-                                fieldValue=round(float(multiplier*responseJson["stats"][Dev]),1)
-                            Devices[DeviceID].Units[Unit].nValue=int(fieldValue)
-                            Devices[DeviceID].Units[Unit].sValue=str(fieldValue)
-                            Devices[DeviceID].Units[Unit].Update()
-
-                        if ((type==243) and (subtype==29)): # kwh device
-                            fieldValue=responseJson["stats"][Dev]
-                            if fieldValue>=0 and fieldValue<10000 : # only valid values will be processed
-                                Devices[DeviceID].Units[Unit].nValue=0
-                                Devices[DeviceID].Units[Unit].sValue=str(fieldValue)+";1" # watts are supplied, kwh are calculated by Domoticz.
-                                Devices[DeviceID].Units[Unit].Update()
-                        if ((type==243) and (subtype==19)): # text device
-                            fieldValue=responseJson["stats"][Dev]
-                            if Dev=="47e0":
-                                Devices[DeviceID].Units[Unit].nValue=0
-                                fieldText=fieldValue
-                            else:
-                                Devices[DeviceID].Units[Unit].nValue=int(fieldValue)
-                                fieldText=str(fieldValue)
-                            if Dev=='777d':
-                                if fieldValue==0: fieldText="DHW"
-                                elif fieldValue==1: fieldText="ON"
-                                elif fieldValue==2:  fieldText="COOLING"
-                                elif fieldValue==253: fieldText="PUMPDOWN"
-                                elif fieldValue==254: fieldText="OFF"
-                                elif fieldValue==255: fieldText="UNDEFINED"
-                                else: fieldText="Unknown, value: "+str(fieldValue)
-                            if Dev=='77dd':
-                                if fieldValue==0: fieldText="MONITOR_LOCKOUT"
-                                elif fieldValue==1: fieldText="PUMP_VENTING"
-                                elif fieldValue==2:  fieldText="SERVICE"
-                                elif fieldValue==3: fieldText="DEFROST"
-                                elif fieldValue==4: fieldText="DHW"
-                                elif fieldValue==5: fieldText="ROOMHEATING_COMFORT"
-                                elif fieldValue==6: fieldText="ROOMHEATING_ECO"
-                                elif fieldValue==7: fieldText="ROOMCOOLING"
-                                elif fieldValue==8: fieldText="DHW_HEATEXCHANGE"
-                                elif fieldValue==9: fieldText="FLOORHEATINGPROTOCOL"
-                                elif fieldValue==12: fieldText="ANTIFREEZE"
-                                elif fieldValue==13: fieldText="PUMP_MAINTENANCE"
-                                elif fieldValue==14: fieldText="IDLE"
-                                elif fieldValue==255: fieldText="NO_TASK"
-                                else: fieldText="Unknown, value: "+str(fieldValue)
-                            if Dev=='6578':
-                                if fieldValue==0: fieldText="COOLING"
-                                elif fieldValue==1: fieldText="HEATING"
-                                elif fieldValue==2:  fieldText="DEFROSTING"
-                                elif fieldValue==3: fieldText="PUMPDOWN"
-                                elif fieldValue==255: fieldText="UNDEFINED"
-                                else: fieldText="Unknown, value: "+str(fieldValue)
-                            if Dev=='657e':
-                                if fieldValue==0: fieldText="DHW"
-                                elif fieldValue==1: fieldText="HEATING"
-                                elif fieldValue==2:  fieldText="COOLING"
-                                elif fieldValue==253: fieldText="PUMPDOWN"
-                                elif fieldValue==254: fieldText="OFF"
-                                elif fieldValue==255: fieldText="UNDEFINED"
-                                else: fieldText="Unknown, value: "+str(fieldValue)
-                            if Dev=='7e51':
-                                if fieldValue==0: fieldText="OPENTHERM"
-                                elif fieldValue==15: fieldText="BOILER_EXT"
-                                elif fieldValue==24:  fieldText="FROST"
-                                elif fieldValue==37:  fieldText="CH_RF"
-                                elif fieldValue==51:  fieldText="DHW_INT"
-                                elif fieldValue==85:  fieldText="SENSORTEST"
-                                elif fieldValue==86:  fieldText="COMMISSIONING"
-                                elif fieldValue==87:  fieldText="CRANKHEATING"
-                                elif fieldValue==102:  fieldText="CENTRAL HEATING"
-                                elif fieldValue==103:  fieldText="CH_WAIT"
-                                elif fieldValue==104:  fieldText="DEFROSTING"
-                                elif fieldValue==117:  fieldText="STARTING_COOLING"
-                                elif fieldValue==118:  fieldText="COOLING"
-                                elif fieldValue==119:  fieldText="COOLING_WAIT"
-                                elif fieldValue==126:  fieldText="STANDBY"
-                                elif fieldValue==127:  fieldText="OFF"
-                                elif fieldValue==153:  fieldText="POSTRUN_BOILER"
-                                elif fieldValue==170:  fieldText="SERVICE"
-                                elif fieldValue==189:  fieldText="POSTRUN_COOLING"
-                                elif fieldValue==204:  fieldText="DHW"
-                                elif fieldValue==205:  fieldText="DHW_HRECO"
-                                elif fieldValue==230:  fieldText="STARTING_CH"
-                                elif fieldValue==231:  fieldText="POSTRUN_CH"
-                                elif fieldValue==240:  fieldText="BOILER_INT"
-                                elif fieldValue==255:  fieldText="HEATUP"
-                                else: fieldText="Unknown, value: "+str(fieldValue)
-                            if Dev=='7e7a':
-                                if fieldValue==0: fieldText="STARTUP"
-                                elif fieldValue==1: fieldText="INTERPURGE"
-                                elif fieldValue==2:  fieldText="POSTPURGE"
-                                elif fieldValue==4: fieldText="PREPURGE"
-                                elif fieldValue==8: fieldText="IGNITION"
-                                elif fieldValue==16: fieldText="WAITING"
-                                elif fieldValue==32: fieldText="RUNNING"
-                                elif fieldValue==64: fieldText="REST"
-                                elif fieldValue==128: fieldText="LOCKOUT"
-                                else: fieldText="Unknown, value: "+str(fieldValue)
-                            if Dev=='843a':
-                                if fieldValue==0: fieldText="OFF"
-                                elif fieldValue==2: fieldText="PRE/POST HEATING RUN"
-                                elif fieldValue==4: fieldText="DHW"
-                                elif fieldValue==8: fieldText="DHW"
-                                elif fieldValue==10: fieldText="GAS HEATING"
-                                elif fieldValue==12: fieldText="DHW"
-                                else: fieldText="Unknown, value: "+str(fieldValue)
-                            if Dev=='f9f2':
-                                bitPosition=8
-                                if (fieldValue & (1 << bitPosition)) !=0 :
-                                    fieldText="ON"
-                                else:
-                                    fieldText="OFF"
-                            Devices[DeviceID].Units[Unit].sValue=fieldText
-                            Devices[DeviceID].Units[Unit].Update()
-                            if Dev=='7940':
-                                if fieldValue!=255:
-                                    raise ValueError(f"notification code {fieldValue}")
-                if self.emailAlertSent==True:
-                    self.emailAlertSent=False
-                    sendemail=requests.get("http://127.0.0.1:8080/json.htm?type=command&param=sendnotification&subject='XTEND comms working again'&body='Problem solved'")
-            else:
-                raise Exception
-        except ValueError:
-            Domoticz.Error("Notification code received:"+str(fieldValue)+" Check manual.")
-            if self.notificationsOn and self.emailAlertSent==False:
-                errorstring="http://127.0.0.1:8080/json.htm?type=command&param=sendnotification&subject='ATTENTION: XTEND notification'&body=Please check code "+str(fieldValue)
-                sendemail=requests.get(errorstring)
-                self.emailAlertSent=True
-        except Timeout:
-            Domoticz.Error("Timeout on getting Xtend data. Check connection.")
-            if self.notificationsOn and self.emailAlertSent==False:
-                sendemail=requests.get("http://127.0.0.1:8080/json.htm?type=command&param=sendnotification&subject='ATTENTION: XTEND communication timeout'&body='Please check and restore the connection by pushing the button on the Xtend '")
-                self.emailAlertSent=True
-        except:
-            Domoticz.Error("No proper Xtend data received. Check connection.")
-            if self.notificationsOn and self.emailAlertSent==False:
-                sendemail=requests.get("http://127.0.0.1:8080/json.htm?type=command&param=sendnotification&subject='ATTENTION: XTEND communication data error'&body='Please check the log and solve the error.'")
-                self.emailAlertSent=True
+    def publishMetrics(self): # load the measurements onto the diagnostic devices of all endpoints and write the metrics file
+        self.nextMetrics=time.time()+MetricsInterval
+        for endpoint in self.endpoints:
+            endpoint.publishMetrics()
+        if self.diagnostics>1 and METRICSFILE!="":
+            try:
+                writeAtomic(os.path.join(Parameters["HomeFolder"],METRICSFILE),prometheusText(self.endpoints))
+            except OSError as error:
+                Domoticz.Error("Metrics file could not be written: "+str(error))
 
+    def dashticzID(self, Unit): # the block id of a device of the first endpoint in a Dashticz config
+        DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
+        unitObj=Devices[DeviceID].Units[Unit]
+        if (unitObj.Type==113 or (unitObj.Type==243 and unitObj.SubType==29)):
+            return "\'"+str(unitObj.ID)+"_1\'"
+        return str(unitObj.ID)
 
     def createCONFIGJS(self): # create a default CONFIG.js file for a Dashticz dashboard
         try:
-            fileHandle=open("DASHTICZCONFIG.js","w")
             # file heading
-            print("var config = {}",file=fileHandle)
-            print("config['language'] = 'en_US'; //or: nl_NL, en_US, de_DE, fr_FR, hu_HU, it_IT, pt_PT, sv_SV",file=fileHandle)
-            print("config['domoticz_ip'] = 'http://xxx.xxx.xxx.xxx:port';",file=fileHandle)
-            print("config['domoticz_refresh'] = '5';",file=fileHandle)
-            print("config['dashticz_refresh'] = '60';",file=fileHandle)
+            lines=["var config = {}",
+                   "config['language'] = 'en_US'; //or: nl_NL, en_US, de_DE, fr_FR, hu_HU, it_IT, pt_PT, sv_SV",
+                   "config['domoticz_ip'] = 'http://xxx.xxx.xxx.xxx:port';",
+                   "config['domoticz_refresh'] = '5';",
+                   "config['dashticz_refresh'] = '60';"]
             # blocks
-            print("//Definition of blocks",file=fileHandle)
-            print("blocks = {}",file=fileHandle)
+            lines+=["//Definition of blocks", "blocks = {}"]
             for Dev in DEVSLIST:
-                Unit=DEVSLIST[Dev][0]
-                DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-                if (Devices[DeviceID].Units[Unit].Type==113 or (Devices[DeviceID].Units[Unit].Type==243 and Devices[DeviceID].Units[Unit].SubType==29)):
-                    print("blocks["+"\'"+str(Devices[DeviceID].Units[Unit].ID)+"_1\'] = {",file=fileHandle)
-                else:
-                    print("blocks["+str(Devices[DeviceID].Units[Unit].ID)+"] = {",file=fileHandle)
-
-                print("    last_update:false,",file=fileHandle)
-                print("    width: 12",file=fileHandle)
-                print("}",file=fileHandle)
+                lines+=["blocks["+self.dashticzID(DEVSLIST[Dev][0])+"] = {", "    last_update:false,", "    width: 12", "}"]
             # columns
-            print("//Definition of columns",file=fileHandle)
-            print("columns = {}",file=fileHandle)
-
-            print("columns[\"xtendsummary\"] = {",file=fileHandle)
-            print("    blocks : [",end=" ",file=fileHandle)
-            for Unit in [1,2,3,47,49,51,50,9]:
-                DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-                if (Devices[DeviceID].Units[Unit].Type==113 or (Devices[DeviceID].Units[Unit].Type==243 and Devices[DeviceID].Units[Unit].SubType==29)):
-                    DomoticzID="\'"+str(Devices[DeviceID].Units[Unit].ID)+"_1\'"
-                else:
-                    DomoticzID=str(Devices[DeviceID].Units[Unit].ID)
-                print(DomoticzID,end=",",file=fileHandle)
-            print("],",file=fileHandle)
-            print("    width: 2",file=fileHandle)
-            print("}",file=fileHandle)
-
-            print("columns[\"xtendtoday\"] = {",file=fileHandle)
-            print("    blocks : [",end=" ",file=fileHandle)
-            for Unit in [22,32,33,36,37,38,43,44,45]:
-                DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-                if (Devices[DeviceID].Units[Unit].Type==113 or (Devices[DeviceID].Units[Unit].Type==243 and Devices[DeviceID].Units[Unit].SubType==29)):
-                    DomoticzID="\'"+str(Devices[DeviceID].Units[Unit].ID)+"_1\'"
-                else:
-                    DomoticzID=str(Devices[DeviceID].Units[Unit].ID)
-                print(DomoticzID,end=",",file=fileHandle)
-            print("],",file=fileHandle)
-            print("    width: 2",file=fileHandle)
-            print("}",file=fileHandle)
-
-            print("columns[\"xtendactual1\"] = {",file=fileHandle)
-            print("    blocks : [",end=" ",file=fileHandle)
-            for Unit in [6,5,4,7,8,10,11,12,13]:
-                DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-                if (Devices[DeviceID].Units[Unit].Type==113 or (Devices[DeviceID].Units[Unit].Type==243 and Devices[DeviceID].Units[Unit].SubType==29)):
-                    DomoticzID="\'"+str(Devices[DeviceID].Units[Unit].ID)+"_1\'"
-                else:
-                    DomoticzID=str(Devices[DeviceID].Units[Unit].ID)
-                print(DomoticzID,end=",",file=fileHandle)
-            print("],",file=fileHandle)
-            print("    width: 2",file=fileHandle)
-            print("}",file=fileHandle)
-
-            print("columns[\"xtendactual2\"] = {",file=fileHandle)
-            print("    blocks : [",end=" ",file=fileHandle)
-            for Unit in [14,15,23,24,27,30,26,31]:
-                DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-                if (Devices[DeviceID].Units[Unit].Type==113 or (Devices[DeviceID].Units[Unit].Type==243 and Devices[DeviceID].Units[Unit].SubType==29)):
-                    DomoticzID="\'"+str(Devices[DeviceID].Units[Unit].ID)+"_1\'"
-                else:
-                    DomoticzID=str(Devices[DeviceID].Units[Unit].ID)
-                print(DomoticzID,end=",",file=fileHandle)
-            print("],",file=fileHandle)
-            print("    width: 2",file=fileHandle)
-            print("}",file=fileHandle)
-
-            print("columns[\"boileractual1\"] = {",file=fileHandle)
-            print("    blocks : [",end=" ",file=fileHandle)
-            for Unit in [34,35,39,40,52,46,41,42,53]:
-                DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-                if (Devices[DeviceID].Units[Unit].Type==113 or (Devices[DeviceID].Units[Unit].Type==243 and Devices[DeviceID].Units[Unit].SubType==29)):
-                    DomoticzID="\'"+str(Devices[DeviceID].Units[Unit].ID)+"_1\'"
-                else:
-                    DomoticzID=str(Devices[DeviceID].Units[Unit].ID)
-                print(DomoticzID,end=",",file=fileHandle)
-            print("],",file=fileHandle)
-            print("    width: 2",file=fileHandle)
-            print("}",file=fileHandle)
-
-
-            print("columns[\"boileractual2\"] = {",file=fileHandle)
-            print("    blocks : [",end=" ",file=fileHandle)
-            for Unit in [16,17,18,19,28,29,20,21,25]:
-                DeviceID="{:04x}{:04x}".format(self.Hwid,Unit)
-                if (Devices[DeviceID].Units[Unit].Type==113 or (Devices[DeviceID].Units[Unit].Type==243 and Devices[DeviceID].Units[Unit].SubType==29)):
-                    DomoticzID="\'"+str(Devices[DeviceID].Units[Unit].ID)+"_1\'"
-                else:
-                    DomoticzID=str(Devices[DeviceID].Units[Unit].ID)
-
-                print(DomoticzID,end=",",file=fileHandle)
-            print("],",file=fileHandle)
-            print("    width: 2",file=fileHandle)
-            print("}",file=fileHandle)
-
-
+            lines+=["//Definition of columns", "columns = {}"]
+            for column in DASHTICZCOLUMNS:
+                lines+=["columns[\""+column+"\"] = {",
+                        "    blocks : [ "+"".join(self.dashticzID(Unit)+"," for Unit in DASHTICZCOLUMNS[column])+"],",
+                        "    width: 2", "}"]
             # screens
-            print("//Definition of screens",file=fileHandle)
-            print("screens = {}",file=fileHandle)
-            print("screens[1] = {",file=fileHandle)  # change this screen number if you already have existing dashticz screens
-            print("    columns: [\"xtendsummary\",\"xtendtoday\",\"xtendactual1\",\"xtendactual2\",\"boileractual1\",\"boileractual2\"]",file=fileHandle)
-            print("}",file=fileHandle)
-            fileHandle.close()
-        except:
+            lines+=["//Definition of screens", "screens = {}",
+                    "screens["+str(DashticzScreen)+"] = {",
+                    "    columns: ["+",".join("\""+column+"\"" for column in DASHTICZCOLUMNS)+"]",
+                    "}"]
+            writeAtomic(DASHTICZFILE,"\n".join(lines)+"\n")
+        except Exception:
             Domoticz.Error("ERROR: problem creating default Dashticz CONFIG.js")
-            fileHandle.close()
 
 global _plugin
 _plugin = XtendPlugin()
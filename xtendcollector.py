@@ -0,0 +1,939 @@
+# Intergas Xtend collector: the part of the Xtend plugin that does not depend on Domoticz, used by plugin.py and usable on its own.
+#
+# Contains the field definitions (DEVSLIST and the texts of the codes), the decoders, a fetcher requesting field values
+# from the Xtend API, the processing of the decoded values (derived metrics, state accounting, energy integration, anomaly
+# detection and the sample store) and the export sinks with the background thread writing to them. Run directly, it polls
+# one or more Xtend units without Domoticz, at any interval, and writes the decoded values as JSON lines to stdout or to a
+# file, to InfluxDB line protocol files, to an MQTT broker, or onto the devices of the plugin through the Domoticz JSON API:
+#
+#   python3 xtendcollector.py --address 10.20.30.1 --interval 5
+#   python3 xtendcollector.py --address 10.20.30.1,192.168.1.60:8080 --interval 2 --fields 62e7,6280,629c,50f2 --jsonl xtend.jsonl
+#   python3 xtendcollector.py --address 10.20.30.1 --interval 10 --domoticz http://127.0.0.1:8080/json.htm
+#   python3 xtendcollector.py --address 10.20.30.1 --interval 30 --derived --store collector_samples.db --anomaly collector_anomaly.json
+#
+# Run it with --help for all options. Do not run it against the same Xtend as the plugin at short intervals, the Xtend WIFI
+# connection handles a limited number of requests.
+
+import json,requests   # make sure these are available in your system environment
+import argparse,math,os,re,signal,sqlite3,sys,threading,time
+from collections import deque
+from array import array
+try:
+    import paho.mqtt.client as mqtt # only needed for the MQTT sink
+except ImportError:
+    mqtt=None
+
+# define the url to get the Xtend field values
+XtendIP="10.20.30.1"  # the IP address of the Xtend indoor unit after activation by pressing the button, used if no address is set
+XtendPort="80"
+XtendAPI="/api/stats/values?fields=" # the API line to request field values
+XtendConnectTimeout=3 # seconds to wait for the connection to the Xtend before the poll is considered failed
+XtendReadTimeout=5 # seconds to wait for the answer of the Xtend once the request is sent
+DomoticzTimeouts=(2,5) # connect and read timeout for requests to the Domoticz JSON API (Domoticz sink, email notifications of the plugin)
+
+# A dictionary to list all parameters to be retrieved from Xtend and to define the Domoticz devices to hold them.
+# Temperature sensor are listed first but order of sensors is not important for the functioning of the program
+# Make sure Unit numbers are incremental and make sure fieldcodes are correct!!!!
+# currently only english name is provided, can be extended with other languages
+# availability of some sensors values will depend on your boiler type and year
+
+# Dictionary structure is as follows: fieldcode : [ Unit, Type, Subtype, Switchtype, OptionsList{}, Multiplier, Name ],
+
+DEVSLIST={
+# 80,5,0 : temperature devices
+    "79b3":  [ 1, 80, 5, 0, {}, 0.01, "Room temp"],
+    "7921":  [ 2, 80, 5, 0, {}, 0.01, "Target room temp"],
+    "62d1":  [ 3, 80, 5, 0, {}, 0.01, "Outside temp"],
+    "6280":  [ 4, 80, 5, 0, {}, 0.01, "HP return temp"],
+    "62e7":  [ 5, 80, 5, 0, {}, 0.01, "HP supply temp "],
+    "62ed":  [ 6, 80, 5, 0, {}, 0.01, "HP setpoint temp"],
+    "65d9":  [ 7, 80, 5, 0, {}, 0.01, "Exhaust gas temp"],
+    "6505":  [ 8, 80, 5, 0, {}, 0.01, "Suction line gas temp"],
+    "47e0":  [ 9, 243,19, 0, {}, 1, "Software version"], # added to replace unused device in version 1.0.0.
+    "6c26":  [ 10, 80, 5, 0, {}, 0.01, "Condensor gas temp"],
+    "6ceb":  [ 11, 80, 5, 0, {}, 0.01, "Condensor liquid temp"],
+    "6cfb":  [ 12, 80, 5, 0, {}, 0.01, "Suction line overheat temp"],
+    "6c33":  [ 13, 80, 5, 0, {}, 0.01, "Discharge overheat temp"],
+    "6c53":  [ 14, 80, 5, 0, {}, 0.01, "Subcooling temp"],
+    "65c1":  [ 15, 80, 5, 0, {}, 0.01, "Coil temp"],
+    "7ee6":  [ 16, 80, 5, 0, {}, 0.01, "Boiler temp"], # replacing 8e38 because no longer available in firmware 0.86
+    "7e31":  [ 17, 80, 5, 0, {}, 0.01, "Boiler CH setpoint temp"],
+    "625b":  [ 18, 80, 5, 0, {}, 0.01, "Boiler CH supply temp"],
+    "7e81":  [ 19, 80, 5, 0, {}, 0.01, "Boiler CH return temp"],
+    "8ecb":  [ 20, 80, 5, 0, {}, 0.01, "Boiler DHW max temp"],
+    "8edb":  [ 21, 80, 5, 0, {}, 0.01, "Boiler DHW actual temp"],
+# 243,9,0 : pressure devices
+    "7ed3":  [ 22, 243, 9, 0, {}, 0.01, "CH water pressure"],
+    "6579":  [ 23, 243, 9, 0, {}, 0.01, "HP suction pressure"],
+    "65b0":  [ 24, 243, 9, 0, {}, 0.01, "HP discharge gas pressure"],
+# 243,30,0 : flow devices
+    "8e7f":  [ 25, 243, 30, 0, {}, 0.01, "Boiler DHW flow"],
+    "629c":  [ 26, 243, 30, 0, {}, 0.01, "HP CH flow"],
+# 243,7,0 : fan device
+    "6c8a":  [ 27, 243, 7, 0, {}, 1, "Fan speed"], # note multiplier 1
+# 243,6,0 : percentage device
+    "848e":  [ 28, 243, 6, 0, {}, 0.01, "Boiler modulation target"],
+    "84d1":  [ 29, 243, 6, 0, {}, 0.01, "Boiler modulation level"],
+    "62cb":  [ 30, 243, 6, 0, {}, 0.01, "Pump level"],
+# 243,31,0 : custom device
+    "65a7":  [ 31, 243, 31, 0, {'Custom':'1;Hz'}, 0.01, "Compressor frequency"], # note options field sets the label for custom device
+    "71a7":  [ 32, 243, 31, 0, {'Custom':'1;HR'}, 1, "HP poweron"],
+# 113,0,3 : counter device
+    "6ac5":  [ 33, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'HR'}, 1, "HP runtime"],
+    "8ef9":  [ 34, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'HR'}, 1, "Boiler CH runtime"],
+    "8e37":  [ 35, 113, 0, 3, {'ValueQuantity':'Custom','ValueUnits':'HR'}, 1, "Boiler DHW runtime"],
+    "6a8e":  [ 36, 113, 0, 3, {}, 1, "HP Compressor starts"],
+    "7160":  [ 37, 113, 0, 3, {}, 1, "HP power cycles"],
+    "6a53":  [ 38, 113, 0, 3, {}, 1, "HP defrost cycles"],
+    "8e00":  [ 39, 113, 0, 3, {}, 1, "Boiler starts"],
+    "6a8d":  [ 40, 113, 0, 3, {}, 1, "Boiler DHW starts"],
+    "8e18":  [ 41, 113, 0, 3, {}, 1, "Boiler flame loss count"],
+    "712c":  [ 42, 113, 0, 3, {}, 1, "Boiler ignition fail count"],
+# 243,29,0 or 4: kwh device
+    "50f2":  [ 43, 243, 29, 0, {'EnergyMeterMode': '1'}, 1, "HP energy usage"],
+    "503e":  [ 44, 243, 29, 4, {'EnergyMeterMode': '1'}, 1, "HP energy generated"],
+# 243,31,0 : custom device
+    "5041":  [ 45, 243, 31, 0, {}, 0.1, "COP"],
+# 243,19,0 : text device
+    "f9f2":  [ 46, 243, 19, 0, {}, 1, "Heat demand Boiler"],
+    "7e51":  [ 47, 243, 19, 0, {}, 1, "Device status"],
+    "7940":  [ 48, 243, 19, 0, {}, 1, "Notification"],
+    "6578":  [ 49, 243, 19, 0, {}, 1, "Operating mode"],
+    "777d":  [ 50, 243, 19, 0, {}, 1, "Heat demand HP"],
+    "77dd":  [ 51, 243, 19, 0, {}, 1, "System status"],
+    "843a":  [ 52, 243, 19, 0, {}, 1, "Boiler status"],
+# devices added in later versions
+    "5088":  [ 53, 243, 29, 4, {'EnergyMeterMode': '1'}, 1, "Boiler energy generated"],
+#    "b2bc":  [ 54, 243, 19, 0, {}, 1, "Boiler flame"],
+#    "f9f2":  [ 55, 243, 19, 0, {}, 1, "Status flags"],
+}
+
+# Polling tiers: the fields of a tier are requested at most once every POLLTIERS[tier] seconds, but never more often than
+# the polling interval. Fields not listed in FIELDTIERS are in the "fast" tier and are requested on every poll.
+POLLTIERS={"fast":0, "slow":300}
+FIELDTIERS={
+    "47e0": "slow", # software version
+    "71a7": "slow", # power on hours
+    "6ac5": "slow", "8ef9": "slow", "8e37": "slow", # runtime hours
+    "6a8e": "slow", "7160": "slow", "8e00": "slow", "6a8d": "slow", "8e18": "slow", "712c": "slow", # start and failure counters
+}
+
+INVALIDVALUE=32767 # value returned by the Xtend for fields without valid data
+
+# Text shown on the text devices for the values of enumerated fields, fieldcode : { value : text }
+# Fields not (yet) in DEVSLIST are kept here for future use.
+ENUMTEXTS={
+    "777d": {0:"DHW", 1:"ON", 2:"COOLING", 253:"PUMPDOWN", 254:"OFF", 255:"UNDEFINED"},
+    "77dd": {0:"MONITOR_LOCKOUT", 1:"PUMP_VENTING", 2:"SERVICE", 3:"DEFROST", 4:"DHW", 5:"ROOMHEATING_COMFORT", 6:"ROOMHEATING_ECO",
+             7:"ROOMCOOLING", 8:"DHW_HEATEXCHANGE", 9:"FLOORHEATINGPROTOCOL", 12:"ANTIFREEZE", 13:"PUMP_MAINTENANCE", 14:"IDLE", 255:"NO_TASK"},
+    "6578": {0:"COOLING", 1:"HEATING", 2:"DEFROSTING", 3:"PUMPDOWN", 255:"UNDEFINED"},
+    "657e": {0:"DHW", 1:"HEATING", 2:"COOLING", 253:"PUMPDOWN", 254:"OFF", 255:"UNDEFINED"},
+    "7e51": {0:"OPENTHERM", 15:"BOILER_EXT", 24:"FROST", 37:"CH_RF", 51:"DHW_INT", 85:"SENSORTEST", 86:"COMMISSIONING", 87:"CRANKHEATING",
+             102:"CENTRAL HEATING", 103:"CH_WAIT", 104:"DEFROSTING", 117:"STARTING_COOLING", 118:"COOLING", 119:"COOLING_WAIT",
+             126:"STANDBY", 127:"OFF", 153:"POSTRUN_BOILER", 170:"SERVICE", 189:"POSTRUN_COOLING", 204:"DHW", 205:"DHW_HRECO",
+             230:"STARTING_CH", 231:"POSTRUN_CH", 240:"BOILER_INT", 255:"HEATUP"},
+    "7e7a": {0:"STARTUP", 1:"INTERPURGE", 2:"POSTPURGE", 4:"PREPURGE", 8:"IGNITION", 16:"WAITING", 32:"RUNNING", 64:"REST", 128:"LOCKOUT"},
+    "843a": {0:"OFF", 2:"PRE/POST HEATING RUN", 4:"DHW", 8:"DHW", 10:"GAS HEATING", 12:"DHW"},
+}
+BITFLAGS={"f9f2": 8} # fieldcode : bit position shown as ON/OFF on a text device
+STRINGFIELDS=["47e0"] # fields that are shown as received, for example the software version
+
+# Decoders used in the decode plan. Each returns (nValue, sValue, numeric value or None), or None for an invalid value.
+def decodeNumeric(rawValue, multiplier):
+    if multiplier==1:
+        fieldValue=round(float(multiplier*rawValue),0)
+    else:
+        fieldValue=round(float(multiplier*rawValue),1)
+    return int(fieldValue), str(fieldValue), fieldValue
+
+def decodeKwh(rawValue, arg):
+    if rawValue>=0 and rawValue<10000: # only valid values will be processed
+        return 0, str(rawValue)+";1", rawValue # watts are supplied, kwh are calculated by Domoticz.
+    return None
+
+def decodeEnum(rawValue, texts):
+    return int(rawValue), texts.get(rawValue,"Unknown, value: "+str(rawValue)), None
+
+def decodeBitflag(rawValue, bitPosition):
+    if (rawValue & (1 << bitPosition)) !=0 :
+        return int(rawValue), "ON", None
+    return int(rawValue), "OFF", None
+
+def decodeString(rawValue, arg):
+    return 0, str(rawValue), None
+
+def decodeText(rawValue, arg):
+    return int(rawValue), str(rawValue), None
+
+def fieldDecoder(Dev): # the decoder and its argument for a field of DEVSLIST, chosen by the type of its Domoticz device
+    Type,Subtype=DEVSLIST[Dev][1:3]
+    if Type==243 and Subtype==29: # kwh device
+        return decodeKwh,None
+    if Type==243 and Subtype==19: # text device
+        if Dev in ENUMTEXTS:
+            return decodeEnum,ENUMTEXTS[Dev]
+        if Dev in BITFLAGS:
+            return decodeBitflag,BITFLAGS[Dev]
+        if Dev in STRINGFIELDS:
+            return decodeString,None
+        return decodeText,None
+    return decodeNumeric,DEVSLIST[Dev][5] # temperature, counter, pressure, waterflow, fan, percentage and custom devices
+
+def decodeStats(stats, plan):
+    # Decode the stats of an answer with a plan of (fieldcode, decoder, arg). Returns the values, fieldcode : number (the
+    # code for text devices), and the device values, fieldcode : (nValue, sValue). Invalid values are left out, STRINGFIELDS
+    # are only in the device values.
+    values={}
+    devices={}
+    for Dev,decoder,arg in plan:
+        rawValue=stats.get(Dev,INVALIDVALUE)
+        if rawValue==INVALIDVALUE:
+            continue
+        decoded=decoder(rawValue,arg)
+        if decoded is not None:
+            if Dev not in STRINGFIELDS:
+                values[Dev]=decoded[0] if decoded[2] is None else decoded[2]
+            devices[Dev]=(decoded[0],decoded[1])
+    return values,devices
+
+def writeAtomic(path, text): # write a file via a temporary file, so readers never see a partly written file
+    tempPath=path+".tmp"
+    with open(tempPath,"w") as fileHandle:
+        fileHandle.write(text)
+    os.replace(tempPath,path)
+
+def rotateFile(path, keep): # rename path to path.1, path.1 to path.2 and so on, path.<keep> is overwritten
+    for number in range(keep-1,0,-1):
+        if os.path.exists(path+"."+str(number)):
+            os.replace(path+"."+str(number),path+"."+str(number+1))
+    os.replace(path,path+".1")
+
+def parseEndpoints(addresses, defaultPort): # "address[:port],address[:port],..." from the hardware settings, as a list of (address, port)
+    endpoints=[]
+    for entry in addresses.split(","):
+        entry=entry.strip()
+        if entry=="":
+            continue
+        if entry.startswith("http://"):
+            entry=entry[7:]
+        address,separator,port=entry.rstrip("/").partition(":")
+        endpoints.append((address,port if separator else defaultPort))
+    return endpoints
+
+def endpointFile(path, index): # path of a file of endpoint index, with the endpoint number added for the second and later endpoints
+    if index==0:
+        return path
+    return os.path.splitext(path)[0]+"_"+str(index+1)+os.path.splitext(path)[1]
+
+class XtendFetcher: # requests field values from the Xtend API, on a connection kept open between requests
+    def __init__(self, address, port):
+        self.url="http://"+address+":"+str(port)+XtendAPI
+        self.session=requests.Session()
+        self.session.mount("http://",requests.adapters.HTTPAdapter(max_retries=1)) # reconnects once if the kept connection was dropped
+
+    def fetch(self, fields): # the stats of the answer, fieldcode : raw value, raises an exception when no proper answer is received
+        response=self.session.get(self.url+",".join(fields), timeout=(XtendConnectTimeout,XtendReadTimeout))
+        response.raise_for_status()
+        return response.json()["stats"]
+
+    def close(self):
+        self.session.close()
+
+# Processing of the decoded values, used by the plugin and by the collector. These classes keep their state in the file
+# given by the caller and make no Domoticz calls. The plugin switches them on with STATEFILE, ENERGYINTEGRATION,
+# ANOMALYFILE and STOREFILE, the collector with its --states, --anomaly, --store and --derived options.
+
+# Derived metrics: values calculated from the decoded fields of every poll and loaded onto their own devices.
+# With window 0 the formula gets the values of the fields of this poll. Otherwise it gets the integrals of the fields over
+# the last window seconds, or since midnight for window "day", for example the energy in Wh for a field in watts.
+# A metric is skipped when one of its fields has no valid value, or when the formula divides by zero.
+# Dictionary structure is as follows: key : [ Unit, Type, Subtype, Switchtype, OptionsList{}, Name, fieldcodes, formula, window ],
+WaterHeatCapacity=4186/60 # watts per liter/minute of water flow per degree of temperature difference
+DerivedMinPower=100 # live COP is 0 below this electrical power in watts
+DerivedMaxGap=600 # seconds without a poll after which the integrals are not continued over the gap
+DERIVEDMETRICS={
+    "deltat":       [ 110, 80, 5, 0, {}, "HP delta T", ["62e7","6280"], lambda supply,ret: supply-ret, 0],
+    "thermalpower": [ 111, 243, 31, 0, {'Custom':'1;W'}, "HP thermal power", ["629c","62e7","6280"],
+                      lambda flow,supply,ret: flow*(supply-ret)*WaterHeatCapacity, 0],
+    "livecop":      [ 112, 243, 31, 0, {'Custom':'1;COP'}, "HP live COP", ["629c","62e7","6280","50f2"],
+                      lambda flow,supply,ret,power: flow*(supply-ret)*WaterHeatCapacity/power if power>=DerivedMinPower else 0, 0],
+    "cop15":        [ 113, 243, 31, 0, {'Custom':'1;COP'}, "HP COP 15 min", ["503e","50f2"], lambda generated,used: generated/used, 900],
+    "copday":       [ 114, 243, 31, 0, {'Custom':'1;COP'}, "HP COP today", ["503e","50f2"], lambda generated,used: generated/used, "day"],
+    "hpshare":      [ 115, 243, 6, 0, {}, "HP share of heat today", ["503e","5088"], lambda hp,boiler: 100*hp/(hp+boiler), "day"],
+}
+
+# State accounting: for the status fields in STATEFIELDS the seconds spent in every state and the number of times each
+# state was entered are counted, today, yesterday and in total. A change of state is placed halfway between two polls, a
+# gap of more than StateMaxGap seconds without a valid value is not counted. Defrost cycles (DEFROSTSTATE) are counted
+# with their duration and compared with the defrost counter of the Xtend (DEFROSTCOUNTER). Everything is kept in one JSON
+# file, written at midnight and every StateSaveInterval seconds, with a readable summary on top.
+STATEFIELDS=["77dd","7e51","6578","843a"]
+StateMaxGap=600
+StateSaveInterval=900
+DEFROSTSTATE=("77dd",3) # field and value of the defrost state
+DEFROSTCOUNTER="6a53"
+
+# Energy integration of the power of the ENERGYFIELDS with the trapezium rule. Values below 0 or above the maximum power
+# of the field are rejected as outliers, a gap of more than EnergyMaxGap seconds between two values is not integrated.
+# The energy counters are written every EnergySaveInterval seconds.
+ENERGYFIELDS={"50f2": 10000, "503e": 20000, "5088": 40000} # fieldcode : maximum power in watts
+EnergyMaxGap=600
+EnergySaveInterval=300
+
+# Anomaly detection: for the fields in ANOMALYFIELDS an exponentially weighted mean and variance of the value and an
+# exponentially weighted rate of change are kept, updated with every poll. The mean and variance follow the value with a
+# time constant of AnomalyBaseline seconds, the rate of change with AnomalySlopeTime seconds. After AnomalyWarmup values an
+# anomaly is raised when the value is more than the z-score limit standard deviations away from the mean, or changes
+# faster than the slope limit per minute, for AnomalyConfirm polls in a row. It is solved when both are below half their
+# limit. A limit of 0 switches that check off, the minimum deviation keeps a flat baseline from raising alerts on small
+# steps. The baselines are written every AnomalySaveInterval seconds.
+ANOMALYFIELDS={ # fieldcode : [ z-score limit, slope limit per minute, minimum standard deviation ]
+    "7ed3": [ 4, 0.2, 0.05], # CH water pressure, bar
+    "6579": [ 5, 3, 0.5],    # HP suction pressure, bar
+    "65b0": [ 5, 5, 1],      # HP discharge gas pressure, bar
+    "6cfb": [ 5, 10, 1],     # Suction line overheat temp
+    "6c33": [ 5, 10, 2],     # Discharge overheat temp
+    "65a7": [ 5, 0, 5],      # Compressor frequency, changes fast by design so only the z-score is checked
+}
+AnomalyBaseline=86400
+AnomalySlopeTime=300
+AnomalyWarmup=120
+AnomalyConfirm=2
+AnomalyMaxGap=600 # seconds without a value after which the rate of change starts again
+AnomalySaveInterval=900
+
+# Local sample store: the decoded values of every poll are written as one row to an SQLite database, with one column per
+# field. The time of a row is in whole seconds, a later poll in the same second replaces the row. Rows are committed in
+# batches of STOREBATCH. Once an hour rows older than STORERAWDAYS are reduced to averages over STORERESAMPLE seconds,
+# these are kept for STOREKEEPDAYS.
+STOREBATCH=30
+STORERAWDAYS=14
+STORERESAMPLE=300
+STOREKEEPDAYS=730
+
+class XtendDerived: # evaluates DERIVEDMETRICS on the decoded values of every poll, keeping the integrals of windowed metrics
+    def __init__(self, keys):
+        self.keys=keys
+        self.lastTime=None # time of the previous poll
+        self.lastValues={} # fieldcode : value in the previous poll, the integrals use the mean of two polls
+        self.windows={key:deque() for key in keys if DERIVEDMETRICS[key][8]!=0 and DERIVEDMETRICS[key][8]!="day"} # key : (time, integrals)
+        self.sums={key:[0.0]*len(DERIVEDMETRICS[key][6]) for key in keys} # key : integrals of the fields over the window
+        self.day=None
+
+    def evaluate(self, now, values): # values is a dictionary fieldcode : decoded value, returns a dictionary key : metric value
+        results={}
+        interval=0 if self.lastTime is None or now-self.lastTime>DerivedMaxGap else now-self.lastTime
+        today=time.strftime("%Y%m%d",time.localtime(now))
+        for key in self.keys:
+            fields,formula,window=DERIVEDMETRICS[key][6:9]
+            if window==0:
+                arguments=[values.get(Dev) for Dev in fields]
+            else:
+                sums=self.sums[key]
+                if window=="day" and self.day!=today:
+                    sums[:]=[0.0]*len(fields)
+                if interval>0 and all(Dev in values and Dev in self.lastValues for Dev in fields):
+                    integrals=[(values[Dev]+self.lastValues[Dev])/2*interval/3600 for Dev in fields]
+                    sums[:]=[total+integral for total,integral in zip(sums,integrals)]
+                    if key in self.windows:
+                        self.windows[key].append((now,integrals))
+                if key in self.windows:
+                    while self.windows[key] and self.windows[key][0][0]<=now-window:
+                        sums[:]=[total-integral for total,integral in zip(sums,self.windows[key].popleft()[1])]
+                arguments=sums
+            if None not in arguments:
+                try:
+                    results[key]=formula(*arguments)
+                except ZeroDivisionError:
+                    pass
+        self.day=today
+        self.lastTime=now
+        self.lastValues=dict(values)
+        return results
+
+class XtendStates: # time in state and transitions of the STATEFIELDS and the defrost cycles, per day and in total, see STATEFIELDS
+    def __init__(self, path):
+        self.path=path
+        self.lastSave=time.time()
+        # fields: fieldcode : {"state", "since": time the state was entered, "seen": time of the last valid value}
+        # today, yesterday and total: fieldcode : state : [seconds, transitions, time last entered, seconds of the last period]
+        # defrost: "today" and "yesterday" : {"cycles", "seconds", "shortest", "longest", "counterStart", "counter"}
+        self.data={"day":None, "previousDay":None, "fields":{}, "today":{}, "yesterday":{}, "total":{}, "defrost":{"today":{}, "yesterday":{}}}
+        try:
+            with open(path) as fileHandle:
+                self.data.update(json.load(fileHandle)["state"])
+        except (OSError, ValueError, KeyError): # first start, the accounting starts now
+            pass
+
+    def update(self, now, stats): # count the raw values of a poll, returns True when the file is due to be written
+        day=time.strftime("%Y-%m-%d",time.localtime(now))
+        rolledOver=(self.data["day"]!=day)
+        if rolledOver: # the period between the last poll before midnight and the first poll after it is counted on the new day
+            self.rollover(day)
+        for Dev in STATEFIELDS:
+            rawValue=stats.get(Dev,INVALIDVALUE)
+            if rawValue==INVALIDVALUE:
+                continue
+            state=str(rawValue)
+            field=self.data["fields"].get(Dev)
+            if field is None or now-field["seen"]>StateMaxGap: # the time before this value is unknown
+                if field is not None and field["state"]!=state:
+                    self.count(Dev,state,0,now)
+                self.data["fields"][Dev]={"state":state, "since":now, "seen":now}
+                continue
+            if state==field["state"]:
+                self.count(Dev,state,now-field["seen"])
+            else:
+                changed=(field["seen"]+now)/2 # the change happened between two polls
+                self.count(Dev,field["state"],changed-field["seen"])
+                self.endPeriod(Dev,field["state"],changed-field["since"])
+                self.count(Dev,state,now-changed,changed)
+                field["state"]=state
+                field["since"]=changed
+            field["seen"]=now
+        counter=stats.get(DEFROSTCOUNTER,INVALIDVALUE)
+        if counter!=INVALIDVALUE:
+            defrost=self.data["defrost"]["today"]
+            if defrost.get("counterStart") is None:
+                defrost["counterStart"]=counter
+            defrost["counter"]=counter
+        return rolledOver or now-self.lastSave>=StateSaveInterval
+
+    def rollover(self, day):
+        data=self.data
+        data["previousDay"]=data["day"]
+        data["yesterday"]=data["today"]
+        data["today"]={}
+        data["defrost"]["yesterday"]=data["defrost"]["today"]
+        data["defrost"]["today"]={"counterStart":data["defrost"]["yesterday"].get("counter")}
+        data["day"]=day
+
+    def accumulator(self, period, Dev, state):
+        return self.data[period].setdefault(Dev,{}).setdefault(state,[0.0,0,None,None])
+
+    def count(self, Dev, state, seconds, entered=None): # entered is the time the state was entered, None if it was not entered now
+        for period in ("today","total"):
+            accumulator=self.accumulator(period,Dev,state)
+            accumulator[0]+=seconds
+            if entered is not None:
+                accumulator[1]+=1
+                accumulator[2]=int(entered)
+
+    def endPeriod(self, Dev, state, duration):
+        for period in ("today","total"):
+            self.accumulator(period,Dev,state)[3]=int(round(duration))
+        if (Dev,state)==(DEFROSTSTATE[0],str(DEFROSTSTATE[1])):
+            defrost=self.data["defrost"]["today"]
+            defrost["cycles"]=defrost.get("cycles",0)+1
+            defrost["seconds"]=defrost.get("seconds",0)+duration
+            defrost["shortest"]=min(defrost.get("shortest",duration),duration)
+            defrost["longest"]=max(defrost.get("longest",duration),duration)
+
+    def value(self, Dev, states, measure): # the value of a STATEDEVICES device, from the totals
+        accumulators=[self.data["total"][Dev][str(state)] for state in states if str(state) in self.data["total"].get(Dev,{})]
+        if measure=="minutes":
+            return int(sum(accumulator[0] for accumulator in accumulators)/60)
+        if measure=="transitions":
+            return sum(accumulator[1] for accumulator in accumulators)
+        accumulator=self.data["total"].get(Dev,{}).get(str(states[0]))
+        return None if accumulator is None else accumulator[3]
+
+    def summary(self): # minutes and transitions per state with the state texts, and the defrost cycles, of today and the previous day
+        summary={}
+        for day,period in [(self.data["day"],"today"),(self.data["previousDay"],"yesterday")]:
+            if day is None:
+                continue
+            states={}
+            for Dev in self.data[period]:
+                states[Dev+" "+DEVSLIST[Dev][6] if Dev in DEVSLIST else Dev]={
+                    ENUMTEXTS.get(Dev,{}).get(int(state),"value")+" ("+state+")": {"minutes":round(accumulator[0]/60,1), "transitions":accumulator[1]}
+                    for state,accumulator in sorted(self.data[period][Dev].items(), key=lambda item: -item[1][0])}
+            defrost=self.data["defrost"][period]
+            cycles=defrost.get("cycles",0)
+            defrostSummary={"cycles":cycles, "minutes":round(defrost.get("seconds",0)/60,1)}
+            if cycles>0:
+                defrostSummary.update({"averageSeconds":int(defrost["seconds"]/cycles), "shortestSeconds":int(defrost["shortest"]), "longestSeconds":int(defrost["longest"])})
+            if defrost.get("counterStart") is not None and "counter" in defrost:
+                defrostSummary["counterIncrements"]=defrost["counter"]-defrost["counterStart"]
+                if cycles>0:
+                    defrostSummary["incrementsPerCycle"]=round(defrostSummary["counterIncrements"]/cycles,2)
+            summary[day]={"states":states, "defrost":defrostSummary}
+        return summary
+
+    def save(self, now):
+        self.lastSave=now
+        writeAtomic(self.path,json.dumps({"summary":self.summary(), "state":self.data},indent=1))
+
+class XtendEnergy: # energy counters of the ENERGYFIELDS, integrated from the power values, see ENERGYFIELDS
+    def __init__(self, path, initial):
+        self.path=path
+        self.lastSave=time.time()
+        self.outliers={} # fieldcode : number of values rejected since the last report
+        self.fields={} # fieldcode : {"wh": energy, "time": time of the last value, "watts": last value}
+        try:
+            with open(path) as fileHandle:
+                self.fields=json.load(fileHandle)
+        except (OSError, ValueError): # first start with energy integration
+            pass
+        for Dev in initial: # initial is fieldcode : energy in Wh on the device, the device is never set back
+            field=self.fields.setdefault(Dev,{"wh":0.0, "time":None, "watts":None})
+            field["wh"]=max(field["wh"],initial[Dev])
+
+    def rejected(self, Dev, watts):
+        return watts<0 or watts>ENERGYFIELDS[Dev]
+
+    def add(self, Dev, sampleTime, watts): # integrate the power since the previous value of the field
+        if self.rejected(Dev,watts):
+            self.outliers[Dev]=self.outliers.get(Dev,0)+1
+            return
+        field=self.fields[Dev]
+        if field["time"] is not None:
+            interval=sampleTime-field["time"]
+            if interval<=0: # not newer than the previous value
+                return
+            if interval<=EnergyMaxGap:
+                field["wh"]+=(field["watts"]+watts)/2*interval/3600
+        field["time"]=sampleTime
+        field["watts"]=watts
+
+    def wh(self, Dev):
+        return self.fields[Dev]["wh"]
+
+    def save(self, now):
+        self.lastSave=now
+        writeAtomic(self.path,json.dumps(self.fields))
+
+class XtendAnomaly: # exponentially weighted baselines of the ANOMALYFIELDS, see ANOMALYFIELDS
+    def __init__(self, path):
+        self.path=path
+        self.lastSave=time.time()
+        self.fields={} # fieldcode : {"n", "mean", "var", "slope", "time" and "value" of the last value, "over": polls in a row over a limit, "alert"}
+        try:
+            with open(path) as fileHandle:
+                self.fields=json.load(fileHandle)
+        except (OSError, ValueError): # first start, the baselines are learned from now on
+            pass
+
+    def update(self, now, values): # add the values of a poll, returns fieldcode : (alert now raised (True) or solved (False), z-score, slope per minute)
+        changes={}
+        for Dev in ANOMALYFIELDS:
+            value=values.get(Dev)
+            if value is None:
+                continue
+            zLimit,slopeLimit,minDeviation=ANOMALYFIELDS[Dev]
+            field=self.fields.get(Dev)
+            if field is None:
+                self.fields[Dev]={"n":1, "mean":value, "var":0.0, "slope":0.0, "time":now, "value":value, "over":0, "alert":False}
+                continue
+            interval=now-field["time"]
+            if interval<=0:
+                continue
+            deviation=max(math.sqrt(field["var"]),minDeviation)
+            zScore=(value-field["mean"])/deviation
+            if interval<=AnomalyMaxGap:
+                weight=1-math.exp(-interval/AnomalySlopeTime)
+                field["slope"]+=weight*((value-field["value"])/interval*60-field["slope"])
+            else:
+                field["slope"]=0.0
+            # the baseline learns from the value clipped to the z-score limit, so a fault is not absorbed within a few polls
+            clipped=value if zLimit==0 or field["n"]<AnomalyWarmup else min(max(value,field["mean"]-zLimit*deviation),field["mean"]+zLimit*deviation)
+            weight=1-math.exp(-interval/AnomalyBaseline) if field["n"]>=AnomalyWarmup else 1/(field["n"]+1) # plain mean and variance while warming up
+            difference=clipped-field["mean"]
+            field["mean"]+=weight*difference
+            field["var"]=(1-weight)*(field["var"]+weight*difference*difference)
+            field["n"]+=1
+            field["time"]=now
+            field["value"]=value
+            if field["n"]<=AnomalyWarmup:
+                continue
+            over=(zLimit>0 and abs(zScore)>zLimit) or (slopeLimit>0 and abs(field["slope"])>slopeLimit)
+            under=(zLimit==0 or abs(zScore)<zLimit/2) and (slopeLimit==0 or abs(field["slope"])<slopeLimit/2)
+            field["over"]=field["over"]+1 if over else 0
+            if not field["alert"] and field["over"]>=AnomalyConfirm:
+                field["alert"]=True
+                changes[Dev]=(True,zScore,field["slope"])
+            elif field["alert"] and under:
+                field["alert"]=False
+                changes[Dev]=(False,zScore,field["slope"])
+        return changes
+
+    def save(self, now):
+        self.lastSave=now
+        writeAtomic(self.path,json.dumps(self.fields))
+
+class XtendStore: # local SQLite store of decoded values, table "samples" at poll resolution and "resampled" for older data
+    def __init__(self, path, fields, codeFields):
+        self.fields=list(fields)
+        self.codeFields=codeFields # fields holding codes instead of measurements, these are not averaged when resampling
+        self.pending=[]
+        self.lastMaintenance=time.time()
+        self.db=sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        for table in ("samples","resampled"):
+            self.db.execute("CREATE TABLE IF NOT EXISTS "+table+" (time INTEGER PRIMARY KEY)")
+            existing=[row[1] for row in self.db.execute("PRAGMA table_info("+table+")")]
+            for Dev in self.fields:
+                if "f_"+Dev not in existing:
+                    self.db.execute("ALTER TABLE "+table+" ADD COLUMN f_"+Dev+" REAL")
+        self.db.commit()
+        self.insertSQL="INSERT OR REPLACE INTO samples (time,"+",".join("f_"+Dev for Dev in self.fields)+") VALUES (?"+",?"*len(self.fields)+")"
+
+    def append(self, sampleTime, snapshot): # snapshot is a dictionary fieldcode : value, missing fields are stored as NULL
+        self.pending.append([int(sampleTime)]+[snapshot.get(Dev) for Dev in self.fields])
+        if len(self.pending)>=STOREBATCH:
+            self.flush()
+        if sampleTime-self.lastMaintenance>=3600:
+            self.maintain(sampleTime)
+
+    def flush(self):
+        if len(self.pending)>0:
+            self.db.executemany(self.insertSQL,self.pending)
+            self.db.commit()
+            self.pending=[]
+
+    def maintain(self, now): # resample and remove at most one day of old rows per call, so the cost per call stays bounded
+        self.lastMaintenance=now
+        cutoff=int(now-STORERAWDAYS*86400)
+        oldest=self.db.execute("SELECT MIN(time) FROM samples").fetchone()[0]
+        if oldest is not None and oldest<cutoff:
+            end=(min(cutoff,oldest+86400)//STORERESAMPLE)*STORERESAMPLE # a slot is never split over two calls
+            columns=",".join(("MAX(f_" if Dev in self.codeFields else "AVG(f_")+Dev+")" for Dev in self.fields)
+            self.db.execute("INSERT OR REPLACE INTO resampled (time,"+",".join("f_"+Dev for Dev in self.fields)+") SELECT (time/?)*? AS slot,"+columns+" FROM samples WHERE time>=? AND time<? GROUP BY slot",(STORERESAMPLE,STORERESAMPLE,oldest,end))
+            self.db.execute("DELETE FROM samples WHERE time>=? AND time<?",(oldest,end))
+        self.db.execute("DELETE FROM resampled WHERE time<?",(int(now-STOREKEEPDAYS*86400),))
+        self.db.commit()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+def queryXtendStore(path, start, end, fields, interval=0):
+    # Read stored values between start and end (unix times) for the given fieldcodes, for use outside the plugin.
+    # With interval>0 the values are averaged per interval seconds. Returns an array of times and a dictionary
+    # fieldcode : array of values of the same length, missing values are NaN.
+    db=sqlite3.connect(path)
+    try:
+        columns=",".join("f_"+Dev for Dev in fields)
+        source="SELECT time,"+columns+" FROM resampled WHERE time>=? AND time<? UNION ALL SELECT time,"+columns+" FROM samples WHERE time>=? AND time<?"
+        if interval>0:
+            query="SELECT (time/?)*? AS slot,"+",".join("AVG(f_"+Dev+")" for Dev in fields)+" FROM ("+source+") GROUP BY slot ORDER BY slot"
+            rows=db.execute(query,(int(interval),int(interval),start,end,start,end))
+        else:
+            rows=db.execute(source+" ORDER BY time",(start,end,start,end))
+        times=array("d")
+        values={Dev:array("d") for Dev in fields}
+        for row in rows:
+            times.append(row[0])
+            for Dev,value in zip(fields,row[1:]):
+                values[Dev].append(math.nan if value is None else value)
+        return times,values
+    finally:
+        db.close()
+
+# Export sinks: each sink has write(batch) and close(). A batch is a list of records (endpoint name, time, values, devices),
+# with values fieldcode : number (the code for text devices, the key of the metric for --derived) and devices
+# fieldcode : (nValue, sValue). The sinks are called by the XtendExporter thread, which writes in batches of up to
+# ExportBatch polls, at least every ExportFlushInterval seconds. At most ExportQueueSize polls wait to be written, when a
+# sink is slow or not reachable the oldest are dropped. The file sinks rotate their file when it grows beyond
+# ExportMaxBytes, ExportKeepFiles older files are kept.
+ExportMaxBytes=10000000
+ExportKeepFiles=5
+ExportQueueSize=1000
+ExportBatch=50
+ExportFlushInterval=5
+DomoticzSinkMaxAge=300 # seconds after which an unchanged value is written to Domoticz again
+
+def recordJSON(record): # a record as a JSON object, with the texts of the text devices
+    name,sampleTime,values,devices=record
+    texts={Dev:devices[Dev][1] for Dev in devices if Dev in DEVSLIST and DEVSLIST[Dev][1:3]==[243,19]}
+    return json.dumps({"endpoint":name, "time":round(sampleTime,3), "values":values, "texts":texts})
+
+class XtendStdoutSink: # writes every poll as one JSON line to stdout
+    def write(self, batch):
+        for record in batch:
+            sys.stdout.write(recordJSON(record)+"\n")
+        sys.stdout.flush()
+
+    def close(self):
+        pass
+
+class XtendJsonlSink: # appends every poll as one JSON line to a file, rotated by size
+    def __init__(self, path):
+        self.path=path
+
+    def write(self, batch):
+        with open(self.path,"a") as fileHandle:
+            fileHandle.write("".join(recordJSON(record)+"\n" for record in batch))
+        if os.path.getsize(self.path)>ExportMaxBytes:
+            rotateFile(self.path,ExportKeepFiles)
+
+    def close(self):
+        pass
+
+class XtendInfluxSink: # appends every poll in the InfluxDB line protocol to xtend.lp in the folder, rotated by size, time in milliseconds
+    def __init__(self, folder):
+        os.makedirs(folder,exist_ok=True)
+        self.path=os.path.join(folder,"xtend.lp")
+
+    def write(self, batch):
+        lines=[]
+        for name,sampleTime,values,devices in batch:
+            fields=",".join(Dev+"="+str(float(values[Dev])) for Dev in values)
+            if fields!="":
+                lines.append("xtend,endpoint="+name.replace(" ","\\ ")+" "+fields+" "+str(int(round(sampleTime*1000)))+"\n")
+        with open(self.path,"a") as fileHandle:
+            fileHandle.write("".join(lines))
+        if os.path.getsize(self.path)>ExportMaxBytes:
+            rotateFile(self.path,ExportKeepFiles)
+
+    def close(self):
+        pass
+
+class XtendMqttSink: # publishes every poll as a JSON message to the MQTT broker, paho reconnects in its own thread
+    def __init__(self, broker, topic):
+        host,separator,port=broker.partition(":")
+        self.topic=topic
+        try:
+            self.client=mqtt.Client(mqtt.CallbackAPIVersion.VERSION2) # paho-mqtt 2.x
+        except AttributeError:
+            self.client=mqtt.Client()
+        self.client.connect_async(host,int(port) if separator else 1883)
+        self.client.loop_start()
+
+    def write(self, batch):
+        for name,sampleTime,values,devices in batch:
+            message=dict(values,time=int(sampleTime))
+            if self.client.publish(self.topic+"/"+name.replace(" ","_"),json.dumps(message)).rc!=mqtt.MQTT_ERR_SUCCESS:
+                raise OSError("MQTT broker not connected")
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+class XtendDomoticzSink: # loads the values onto the devices of the plugin through the Domoticz JSON API
+    def __init__(self, url):
+        self.url=url
+        self.session=requests.Session()
+        self.idx=None # (endpoint name, fieldcode) : idx of the device
+        self.written={} # (endpoint name, fieldcode) : (nValue, sValue, time written)
+
+    def findDevices(self): # the devices created by the plugin, found by the fieldcode in their description and the XTEND prefix in their name
+        result=self.session.get(self.url, params={"type":"command", "param":"getdevices", "filter":"all"}, timeout=DomoticzTimeouts).json().get("result",[])
+        self.idx={}
+        for device in result:
+            Dev=device.get("Description","").partition("Xtend field code :")[2]
+            if Dev in DEVSLIST:
+                match=re.search(r"XTEND( \d+)?: ",device.get("Name",""))
+                self.idx[("Xtend"+(match.group(1) or "") if match else "Xtend",Dev)]=device["idx"]
+
+    def write(self, batch):
+        if self.idx is None:
+            self.findDevices()
+        latest={} # only the last value of each device in the batch is written
+        for name,sampleTime,values,devices in batch:
+            for Dev in devices:
+                latest[(name,Dev)]=devices[Dev]
+        now=time.time()
+        for Key in latest:
+            if Key not in self.idx:
+                continue
+            nValue,sValue=latest[Key]
+            written=self.written.get(Key)
+            if written is not None and written[0:2]==(nValue,sValue) and now-written[2]<DomoticzSinkMaxAge:
+                continue
+            self.session.get(self.url, params={"type":"command", "param":"udevice", "idx":self.idx[Key], "nvalue":nValue, "svalue":sValue}, timeout=DomoticzTimeouts).raise_for_status()
+            self.written[Key]=(nValue,sValue,now)
+
+    def close(self):
+        self.session.close()
+
+class XtendExporter: # background thread handing the decoded values of the polls to the export sinks in batches
+    def __init__(self, sinks, flushInterval=ExportFlushInterval):
+        self.sinks=sinks
+        self.flushInterval=flushInterval
+        self.queue=deque(maxlen=ExportQueueSize) # records, the oldest is dropped when full
+        self.dropped=0 # polls dropped because the queue was full
+        self.failed=0 # batches a sink could not write
+        self.wakeup=threading.Event()
+        self.stopEvent=threading.Event()
+        self.thread=threading.Thread(name="XtendExporter", target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self): # the polls still queued are written first
+        self.stopEvent.set()
+        self.wakeup.set()
+        self.thread.join(10)
+
+    def send(self, name, sampleTime, values, devices={}):
+        if len(self.queue)==self.queue.maxlen:
+            self.dropped+=1
+        self.queue.append((name,sampleTime,values,devices))
+        if len(self.queue)>=ExportBatch:
+            self.wakeup.set()
+
+    def run(self): # no Domoticz calls are allowed in this thread
+        while True:
+            self.wakeup.wait(self.flushInterval)
+            self.wakeup.clear()
+            stopping=self.stopEvent.is_set()
+            while len(self.queue)>0:
+                batch=[]
+                while len(batch)<ExportBatch:
+                    try:
+                        batch.append(self.queue.popleft())
+                    except IndexError:
+                        break
+                for sink in self.sinks:
+                    try:
+                        sink.write(batch)
+                    except Exception:
+                        self.failed+=1
+            if stopping:
+                break
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception:
+                pass
+
+class XtendCollector: # polls one Xtend in its own thread at a fixed interval and hands the decoded values to the exporter
+    def __init__(self, name, address, port, fields, interval, exporter, derived=False, store=None, states=None, anomaly=None):
+        self.name=name
+        self.fetcher=XtendFetcher(address,port)
+        self.interval=interval
+        self.exporter=exporter
+        self.plan={tier:[(Dev,)+fieldDecoder(Dev) for Dev in fields if FIELDTIERS.get(Dev,"fast")==tier] for tier in POLLTIERS} # tier : decode plan
+        # optional processing, store, states and anomaly are the paths of their files or None
+        self.derived=XtendDerived([key for key in DERIVEDMETRICS if all(Dev in fields for Dev in DERIVEDMETRICS[key][6])]) if derived else None
+        self.storeFile=store
+        self.storeFields=[Dev for Dev in fields if Dev not in STRINGFIELDS]
+        self.store=None # opened in the thread of the collector, SQLite connections can not be shared between threads
+        self.states=XtendStates(states) if states else None
+        self.anomaly=XtendAnomaly(anomaly) if anomaly else None
+        self.tierLastPolled=dict.fromkeys(POLLTIERS,None)
+        self.stopEvent=threading.Event()
+        self.thread=threading.Thread(name="XtendCollector "+name, target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopEvent.set()
+        self.thread.join(XtendConnectTimeout+XtendReadTimeout+1)
+
+    def poll(self, now):
+        tiers=[tier for tier in POLLTIERS if len(self.plan[tier])>0 and (self.tierLastPolled[tier] is None or now-self.tierLastPolled[tier]>=POLLTIERS[tier])]
+        plan=[step for tier in tiers for step in self.plan[tier]]
+        stats=self.fetcher.fetch([step[0] for step in plan])
+        values,devices=decodeStats(stats,plan)
+        for tier in tiers:
+            self.tierLastPolled[tier]=now
+        if self.store is not None:
+            self.store.append(now,values)
+        if self.states is not None and self.states.update(now,stats):
+            self.states.save(now)
+        if self.anomaly is not None:
+            self.checkAnomalies(now,values)
+        if self.derived is not None: # exported with the key of the metric instead of a fieldcode
+            values.update(self.derived.evaluate(now,values))
+        self.exporter.send(self.name,now,values,devices)
+
+    def checkAnomalies(self, now, values):
+        changes=self.anomaly.update(now,values)
+        for Dev in changes:
+            raised,zScore,slope=changes[Dev]
+            self.report(("anomaly on " if raised else "anomaly solved on ")+Dev+" "+DEVSLIST[Dev][6]+": value "+str(values[Dev])+", z-score "+str(round(zScore,1))+", change "+str(round(slope,2))+" per minute")
+        if now-self.anomaly.lastSave>=AnomalySaveInterval:
+            self.anomaly.save(now)
+
+    def report(self, text):
+        sys.stderr.write(time.strftime("%Y-%m-%d %H:%M:%S")+" "+self.name+": "+text+"\n")
+
+    def run(self):
+        if self.storeFile:
+            try:
+                self.store=XtendStore(self.storeFile,self.storeFields,list(ENUMTEXTS)+list(BITFLAGS)+["7940"])
+            except sqlite3.Error as error:
+                self.report("sample store could not be opened: "+str(error))
+        nextPoll=time.monotonic()
+        while not self.stopEvent.is_set():
+            try:
+                self.poll(time.time())
+            except Exception as error:
+                self.report("no proper Xtend data received: "+str(error))
+            nextPoll=max(nextPoll+self.interval,time.monotonic()) # a poll that took longer than the interval is not caught up
+            self.stopEvent.wait(nextPoll-time.monotonic())
+        self.fetcher.close()
+        try:
+            if self.store is not None:
+                self.store.close()
+            if self.states is not None:
+                self.states.save(time.time())
+            if self.anomaly is not None:
+                self.anomaly.save(time.time())
+        except (OSError, sqlite3.Error) as error:
+            self.report("files could not be written: "+str(error))
+
+def main():
+    parser=argparse.ArgumentParser(description="Poll Intergas Xtend units without Domoticz and write the values to sinks")
+    parser.add_argument("--address", default=XtendIP, help="Xtend address(es), address[:port] separated by commas")
+    parser.add_argument("--port", default=XtendPort, help="port used for addresses without a port")
+    parser.add_argument("--interval", type=float, default=10, help="polling interval in seconds")
+    parser.add_argument("--fields", default="", help="fieldcodes to poll separated by commas, default all fields in DEVSLIST")
+    parser.add_argument("--stdout", action="store_true", help="write JSON lines to stdout, the default without other sinks")
+    parser.add_argument("--jsonl", help="append JSON lines to this file")
+    parser.add_argument("--influx", help="append InfluxDB line protocol to xtend.lp in this folder, time in ms (precision ms)")
+    parser.add_argument("--mqtt", help="publish to this MQTT broker, host[:port]")
+    parser.add_argument("--mqtt-topic", default="xtend", help="MQTT topic, the endpoint name is added")
+    parser.add_argument("--domoticz", help="load the values onto the plugin devices through this Domoticz JSON API url")
+    parser.add_argument("--derived", action="store_true", help="add the DERIVEDMETRICS of the polled fields to the values")
+    parser.add_argument("--store", help="store the values in this SQLite database, see queryXtendStore, needs an interval of 1 second or more")
+    parser.add_argument("--states", help="count the time in state of the STATEFIELDS in this JSON file")
+    parser.add_argument("--anomaly", help="report anomalies of the ANOMALYFIELDS on stderr, baselines kept in this JSON file")
+    args=parser.parse_args()
+    fields=[Dev for Dev in args.fields.split(",") if Dev!=""] or list(DEVSLIST)
+    if args.store and args.interval<1:
+        parser.error("the sample store keeps one row per second, use --interval 1 or more with --store")
+    unknown=[Dev for Dev in fields if Dev not in DEVSLIST]
+    if len(unknown)>0:
+        parser.error("fields not in DEVSLIST: "+",".join(unknown))
+    sinks=[]
+    if args.jsonl:
+        sinks.append(XtendJsonlSink(args.jsonl))
+    if args.influx:
+        sinks.append(XtendInfluxSink(args.influx))
+    if args.mqtt:
+        if mqtt is None:
+            parser.error("the MQTT sink needs the paho-mqtt package (pip3 install paho-mqtt)")
+        sinks.append(XtendMqttSink(args.mqtt,args.mqtt_topic))
+    if args.domoticz:
+        sinks.append(XtendDomoticzSink(args.domoticz))
+    if args.stdout or len(sinks)==0:
+        sinks.append(XtendStdoutSink())
+    exporter=XtendExporter(sinks,min(args.interval,ExportFlushInterval))
+    exporter.start()
+    collectors=[]
+    for index,(address,port) in enumerate(parseEndpoints(args.address,args.port)):
+        files=[endpointFile(path,index) if path else None for path in (args.store,args.states,args.anomaly)] # a file per Xtend
+        collectors.append(XtendCollector("Xtend" if index==0 else "Xtend "+str(index+1),address,port,fields,args.interval,exporter,args.derived,*files))
+    stopEvent=threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopEvent.set())
+    for collector in collectors:
+        collector.start()
+    try:
+        while not stopEvent.wait(60):
+            if exporter.failed>0 or exporter.dropped>0:
+                sys.stderr.write(time.strftime("%Y-%m-%d %H:%M:%S")+" export: "+str(exporter.failed)+" batches could not be written, "+str(exporter.dropped)+" polls dropped\n")
+                exporter.failed=0
+                exporter.dropped=0
+    except KeyboardInterrupt:
+        pass
+    for collector in collectors:
+        collector.stop()
+    exporter.stop()
+
+if __name__=="__main__":
+    main()